@@ -2,10 +2,16 @@ import pygame
 
 
 darkmode = True
+palette_version = 0  # bumped on every palette switch so render caches can rebuild
 screen = None
 
 WIDTH, HEIGHT = (0, 0)
 
+TICK_RATE = 60  # simulation ticks per second
+FPS = 60  # frame rate cap, rendering interpolates between ticks
+IDLE_TIMEOUT = 250  # ms a scene with nothing moving waits for input before it draws again
+dirty_rects = True  # games that support it only redraw and update the regions that changed
+
 def get_height():
     return pygame.display.get_surface().get_height()
 
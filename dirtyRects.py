@@ -0,0 +1,60 @@
+import pygame
+
+import config
+
+
+class DirtyRects:
+    # Dirty-rectangle rendering. Everything that does not move (fill, border,
+    # scores, board) is drawn once into a cached background. Each frame the
+    # moving parts drawn last frame are erased by copying the background over
+    # their rects, the new ones are drawn and only the old and new rects are
+    # sent to pygame.display.update. A frame drawn the usual way, full screen
+    # with overlays, calls full_frame() and is flipped as a whole
+    def __init__(self):
+        self.background = None
+        self.key = None
+        self.drawn = []  # rects of the moving parts on screen
+        self.dirty = []  # rects to update this frame
+        self.valid = False  # the screen shows the background plus drawn
+        self.full = True  # the next present() flips the whole screen
+
+    def begin(self, screen, key, build):
+        # Start a frame. key describes the background, when it changes
+        # build(surface) draws a new one. Returns False when dirty rects are off and the caller should draw
+        # the full frame instead
+        if not config.dirty_rects:
+            self.full_frame()
+            return False
+        key = (config.palette_version, screen.get_size(), key)
+        if key != self.key:
+            self.background = pygame.Surface(screen.get_size()).convert()
+            build(self.background)
+            self.key = key
+            self.valid = False
+        if not self.valid:
+            screen.blit(self.background, (0, 0))
+            self.valid = True
+            self.full = True
+        else:
+            for rect in self.drawn:
+                screen.blit(self.background, rect, rect)
+        self.dirty = self.drawn
+        self.drawn = []
+        return True
+
+    def add(self, rect):
+        # Register the rect of something drawn this frame, e.g. the return
+        # value of screen.blit or pygame.draw
+        self.drawn.append(rect)
+
+    def full_frame(self):
+        self.valid = False
+        self.full = True
+        self.drawn = []
+
+    def present(self):
+        if self.full:
+            pygame.display.flip()
+            self.full = False
+        else:
+            pygame.display.update(self.dirty + self.drawn)
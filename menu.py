@@ -1,7 +1,7 @@
 import pygame
-import sys
 
 import config
+import scenes
 from minigames import trails as trail_game
 from minigames import connectFour as connectFour
 from minigames import pong as pong
@@ -19,11 +19,9 @@ def handle_events(menu_state, menu_screen, settings_screen, choose_game_screen,
     for event in pygame.event.get():
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_q and (event.mod & pygame.KMOD_META):
-                pygame.quit()
-                sys.exit()
+                scenes.manager.quit()
         if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
+            scenes.manager.quit()
 
         if menu_state.show_quit_confirmation:
             quit_screen.handle(menu_state, event)
@@ -35,42 +33,49 @@ def handle_events(menu_state, menu_screen, settings_screen, choose_game_screen,
             menu_screen.handle(menu_state, event)
 
 
-def main():
-
-    pygame.init()
-    config.fonts['standard_button'] = pygame.font.SysFont(None, 50)
-    config.fonts['selected_button'] = pygame.font.SysFont(None, 65)
-    config.fonts['score'] = pygame.font.SysFont(None, 40)
-
-    config.screen = pygame.display.set_mode((config.WIDTH, config.HEIGHT), pygame.RESIZABLE)
-    pygame.display.set_caption("Arcade")
-    config.WIDTH, config.HEIGHT = pygame.display.get_surface().get_size()
-
-    menu_screen = screens.MenuScreen()
-    settings_screen = screens.SettingsScreen()
-    choose_game_screen = screens.ChooseGameScreen(lambda: trail_game.main(), lambda: connectFour.main(), lambda: pong.main(), lambda: trailPong.main())
-    quit_screen = screens.QuitScreen()
-
-    menu_state = MenuState()
-
-    while True:
-
-        handle_events(menu_state, menu_screen, settings_screen, choose_game_screen, quit_screen)
+class MenuScene(scenes.Scene):
+    def __init__(self):
+        self.menu_screen = screens.MenuScreen()
+        self.settings_screen = screens.SettingsScreen()
+        self.choose_game_screen = screens.ChooseGameScreen(
+            lambda: scenes.manager.push(trail_game.TrailsScene),
+            lambda: scenes.manager.push(connectFour.ConnectFourScene),
+            lambda: scenes.manager.push(pong.PongScene),
+            lambda: scenes.manager.push(trailPong.TrailPongScene),
+        )
+        self.quit_screen = screens.QuitScreen()
+        self.menus = (self.menu_screen, self.settings_screen, self.choose_game_screen, self.quit_screen)
+
+    def enter(self):
+        # Coming back from a game always lands on the main menu
+        super().enter()
+        self.menu_state = MenuState()
+
+    def animating(self):
+        return False
+
+    def frame(self, frame_time):
+        menu_state = self.menu_state
+        handle_events(menu_state, self.menu_screen, self.settings_screen, self.choose_game_screen, self.quit_screen)
         pygame.mouse.set_visible(True)
 
         if menu_state.show_quit_confirmation:
             config.screen.fill(config.BLACK)
-            quit_screen.draw_screen(config.screen)
+            self.quit_screen.draw_screen(config.screen)
         elif menu_state.show_choose_game:
-            choose_game_screen.draw_screen(config.screen)
+            self.choose_game_screen.draw_screen(config.screen)
         elif menu_state.show_settings:
             config.screen.fill(config.BLACK)
-            settings_screen.draw_screen(config.screen)
+            self.settings_screen.draw_screen(config.screen)
         else:
-            menu_screen.draw_screen(config.screen)
+            self.menu_screen.draw_screen(config.screen)
 
         pygame.display.flip()
 
 
+def main():
+    scenes.manager.run(MenuScene)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,13 +1,34 @@
 import pygame
-import sys
+import random
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 import config
+import scenes
+import textCache
 import screens
+from timestep import FixedTimestep
+from dirtyRects import DirtyRects
+from minigames.connectFourEngine import Bitboard
+from minigames.connectFourAI import DIFFICULTIES, Engine, pool_context
+from minigames.connectFourAnalysis import GameAnalysis, analyse_move
+from minigames.connectFourBook import OpeningBook
+from minigames.connectFourMCTS import MCTSEngine
+from minigames.connectFourPuzzles import PuzzleSet
+from minigames.connectFourWorker import AI_MOVE, AIWorker
+from minigames.connectFourRenderer import BoardRenderer, piece_color, piece_radius
 
 ROWS, COLS = 6, 7
-SQUARE_SIZE = 100
-RADIUS = SQUARE_SIZE // 2 - 5
+CONNECT = 4
+# (rows, columns, pieces in a row to win) to choose from before a game
+BOARD_SIZES = [(6, 7, 4), (7, 8, 4), (8, 9, 4), (10, 12, 5), (6, 7, 5)]
+MAX_SQUARE_SIZE = 100
+DROP_SPEED = 1080  # pixels per second for the falling piece
+AI_PLAYER = 2  # the computer opponent plays player 2
+
+board_renderer = BoardRenderer()
+dirty_rects = DirtyRects()
 
 
 class Player:
@@ -24,21 +45,27 @@ class Player:
     def move_left(self):
         self.current_col = max(0, self.current_col - 1)
 
-    def move_right(self):
-        self.current_col = min(COLS - 1, self.current_col + 1)
+    def move_right(self, cols):
+        self.current_col = min(cols - 1, self.current_col + 1)
 
     def increment_score(self):
         self.score += 1
 
 class GameState:
     def __init__(self):
+        self.rows, self.cols, self.connect = ROWS, COLS, CONNECT
+        self.chosen_board = (ROWS, COLS, CONNECT)
         self.board = create_board()
+        self.bitboard = Bitboard(ROWS, COLS, CONNECT)  # mirrors board, used for move and win logic
         self.players = [
             Player(1, config.PURPLE, pygame.K_a, pygame.K_d, pygame.K_s),
             Player(2, config.LIGHT_BLUE, pygame.K_LEFT, pygame.K_RIGHT, pygame.K_DOWN)
         ]
         self.game_over = False
         self.winner_found = False
+        self.winner = 0
+        self.winning_cells = []
+        self.restart_button_rect = None  # set when the winner view is drawn
         self.show_settings = False
         self.paused = False
         self.show_quit_confirmation = False
@@ -50,57 +77,177 @@ class GameState:
         self.drop_col = None
         self.drop_row = None
         self.drop_y = None
+        self.prev_drop_y = None
+        self.opponent = 'human'  # 'mcts', 'puzzles' or a connectFourAI difficulty
+        self.engines = {}
+        self.book = None
+        self.ai = None  # AIWorker running the computer's searches
+        self.ai_token = None  # token of the move the computer is thinking about
+        self.ai_move = None  # column chosen by the computer, played on its turn
+        self.pondering = False
+        self.analysis = None  # GameAnalysis of the last finished game
+        self.analysis_pool = None
+        self.show_analysis = False
+        self.puzzles = None  # PuzzleSet played against by the 'puzzles' opponent
+        self.puzzle = None  # (moves to win, winning column) of the puzzle being played
+        self.puzzle_level = 1  # moves to win of the next puzzle
+        self.puzzle_start = 0  # stones on the board when the puzzle was set up
+
+    def choose_board(self, rows, cols, connect):
+        # The size picked on the start screen; puzzles bring their own board
+        # for one game, restart_game goes back to this one
+        self.chosen_board = (rows, cols, connect)
+        self.set_board(rows, cols, connect)
+
+    def set_board(self, rows, cols, connect):
+        self.rows, self.cols, self.connect = rows, cols, connect
+        self.board = create_board(rows, cols)
+        self.bitboard = Bitboard(rows, cols, connect)
+        for player in self.players:
+            player.current_col = cols // 2
+
+def board_geometry(game_state):
+    # (square size, offset_x, offset_y) fitting the board, the row for the
+    # active piece above it and the bar below it into the window
+    rows, cols = game_state.rows, game_state.cols
+    square = min(MAX_SQUARE_SIZE, (config.WIDTH - 100) // (cols + 1), (config.HEIGHT - 150) * 2 // (2 * rows + 3))
+    return square, (config.WIDTH - cols * square) // 2, (config.HEIGHT - (rows + 1) * square) // 2
+
+def check_winner(game_state, row, col):
+    # Runs once when a piece lands and only checks lines through that cell;
+    # the result is cached on game_state for the renderer
+    cells = game_state.bitboard.line_through(row, col)
+    if cells:
+        winner = int(game_state.board[row][col])
+        game_state.winner = winner
+        game_state.winning_cells = cells
+        game_state.players[winner-1].increment_score()
+        game_state.winner_found = True
+    elif game_state.bitboard.is_full():
+        # a draw, nobody scores
+        game_state.winner_found = True
+    elif game_state.puzzle is not None and puzzle_moves_left(game_state) == 0:
+        # out of moves without the win, the puzzle counts for the computer
+        game_state.players[AI_PLAYER-1].increment_score()
+        game_state.winner_found = True
+    if game_state.winner_found:
+        if game_state.puzzle is not None:
+            finish_puzzle(game_state)
+        else:
+            start_analysis(game_state)
+
+def start_analysis(game_state):
+    # Analyse the finished game in a process pool while the result is shown
+    if game_state.analysis_pool is None:
+        game_state.analysis_pool = ProcessPoolExecutor(mp_context=pool_context(analyse_move))
+    try:
+        game_state.analysis = GameAnalysis(game_state.analysis_pool, game_state.bitboard)
+    except BrokenProcessPool:
+        # a worker died during an earlier analysis, start over with a new pool
+        game_state.analysis_pool.shutdown(cancel_futures=True)
+        game_state.analysis_pool = ProcessPoolExecutor(mp_context=pool_context(analyse_move))
+        game_state.analysis = GameAnalysis(game_state.analysis_pool, game_state.bitboard)
+
+def stop_analysis(game_state):
+    if game_state.analysis is not None:
+        game_state.analysis.cancel()
+    game_state.analysis = None
+    game_state.show_analysis = False
+
+def start_puzzle(game_state):
+    # Set up a random puzzle of the current level from the puzzle file; the
+    # human plays player 1 and moves first, the computer defends
+    puzzles = game_state.puzzles
+    level = min(puzzles.levels(), key=lambda moves: abs(moves - game_state.puzzle_level))
+    bitboard, col = puzzles.get(level, random.randrange(puzzles.count(level)))
+    game_state.set_board(puzzles.rows, puzzles.cols, puzzles.connect)
+    game_state.bitboard = bitboard
+    game_state.board = np.array(bitboard.to_array())
+    game_state.puzzle = (level, col)
+    game_state.puzzle_start = len(bitboard.moves)
+    game_state.players[0].is_turn = True
+    game_state.players[1].is_turn = False
+
+def puzzle_moves_left(game_state):
+    played = sum(1 for _, player in game_state.bitboard.moves[game_state.puzzle_start:] if player == 1)
+    return game_state.puzzle[0] - played
+
+def finish_puzzle(game_state):
+    # A solved puzzle moves on to a longer win, a failed one to a shorter one
+    levels = game_state.puzzles.levels()
+    i = levels.index(game_state.puzzle[0])
+    i = min(i + 1, len(levels) - 1) if game_state.winner == 1 else max(i - 1, 0)
+    game_state.puzzle_level = levels[i]
+
+def place_piece(game_state, col, player_id):
+    # Drop a piece into both the bitboard and the board array
+    row = game_state.bitboard.play(col, player_id)
+    game_state.board[row][col] = player_id
+    return row
+
+def start_drop(game_state, col):
+    game_state.dropping = True
+    game_state.drop_col = col
+    game_state.drop_row = game_state.bitboard.next_open_row(col)
+    square, _, offset_y = board_geometry(game_state)
+    game_state.drop_y = offset_y + square // 2
+
+def is_ai_turn(game_state):
+    return (
+        game_state.opponent != 'human'
+        and game_state.players[AI_PLAYER-1].is_turn
+        and game_state.game_started
+        and not (game_state.dropping or game_state.winner_found or game_state.paused or game_state.game_over)
+        and not (game_state.show_settings or game_state.show_quit_confirmation or game_state.go_to_menu)
+        and not game_state.choose_starting_player
+    )
 
-def check_winner(game_state):
-    rows = len(game_state.board)
-    cols = len(game_state.board[0])
-    winner = 0
-
-    for r in range(rows):
-        for c in range(cols):
-            player = game_state.board[r][c]
-            if player == 0:
-                continue
-            # Horizontal
-            if c <= cols - 4 and all(game_state.board[r][c+i] == player for i in range(4)):
-                winner = player
-            # Vertikal
-            elif r <= rows - 4 and all(game_state.board[r+i][c] == player for i in range(4)):
-                winner = player
-            # Diagonal ↘
-            elif r <= rows - 4 and c <= cols - 4 and all(game_state.board[r+i][c+i] == player for i in range(4)):
-                winner = player
-            # Diagonal ↗
-            elif r >= 3 and c <= cols - 4 and all(game_state.board[r-i][c+i] == player for i in range(4)):
-                winner = player
-            if winner in (1, 2):
-                game_state.players[int(winner)-1].increment_score()
-                game_state.winner_found = True
-                return
-
-def get_winning_positions(board):
-    rows, cols = len(board), len(board[0])
-    for r in range(rows):
-        for c in range(cols):
-            player = board[r][c]
-            if player == 0:
-                continue
-            # Horizontal
-            if c <= cols - 4 and all(board[r][c+i] == player for i in range(4)):
-                return [(r, c+i) for i in range(4)]
-            # Vertikal
-            if r <= rows - 4 and all(board[r+i][c] == player for i in range(4)):
-                return [(r+i, c) for i in range(4)]
-            # Diagonal ↘
-            if r <= rows - 4 and c <= cols - 4 and all(board[r+i][c+i] == player for i in range(4)):
-                return [(r+i, c+i) for i in range(4)]
-            # Diagonal ↗
-            if r >= 3 and c <= cols - 4 and all(board[r-i][c+i] == player for i in range(4)):
-                return [(r-i, c+i) for i in range(4)]
-    return []
-
-def piece_color(piece):
-    return config.PURPLE if piece == 1 else config.LIGHT_BLUE
+def get_engine(game_state):
+    # Puzzles are defended by the hard engine
+    opponent = 'hard' if game_state.opponent == 'puzzles' else game_state.opponent
+    engine = game_state.engines.get(opponent)
+    if engine is None:
+        if opponent == 'mcts':
+            engine = MCTSEngine()
+        else:
+            engine = Engine.for_difficulty(opponent, game_state.book)
+        game_state.engines[opponent] = engine
+    return engine
+
+def stop_ai(game_state):
+    if game_state.ai is not None:
+        game_state.ai.cancel()
+    game_state.ai_token = None
+    game_state.ai_move = None
+    game_state.pondering = False
+
+def update_ai(game_state):
+    # Hand the computer's turns to the background worker and play its moves.
+    # During the human's turn the worker ponders their expected reply, but not
+    # once the game is over or while a menu, the pause or the settings screen is open
+    if game_state.opponent == 'human' or game_state.ai is None:
+        return
+    if (
+        game_state.winner_found or game_state.go_to_menu or game_state.show_quit_confirmation
+        or game_state.paused or game_state.show_settings
+    ):
+        if game_state.pondering:
+            stop_ai(game_state)
+        return
+    if is_ai_turn(game_state):
+        if game_state.ai_move is not None:
+            col, game_state.ai_move = game_state.ai_move, None
+            game_state.players[AI_PLAYER-1].current_col = col
+            start_drop(game_state, col)
+        elif game_state.ai_token is None:
+            game_state.ai_token = game_state.ai.think(get_engine(game_state), game_state.bitboard, AI_PLAYER)
+            game_state.pondering = False
+    elif (
+        game_state.game_started and not game_state.choose_starting_player and not game_state.pondering
+        and not game_state.players[AI_PLAYER-1].is_turn
+    ):
+        game_state.ai.ponder(get_engine(game_state), game_state.bitboard, AI_PLAYER)
+        game_state.pondering = True
 
 def handle_events(
         game_state,
@@ -114,8 +261,13 @@ def handle_events(
 ):
     for event in pygame.event.get():
         if (event.type == pygame.KEYDOWN and event.key == pygame.K_q and (event.mod & pygame.KMOD_META)) or event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
+            scenes.manager.quit()
+
+        if event.type == AI_MOVE:
+            if event.token == game_state.ai_token:
+                game_state.ai_move = event.col
+                game_state.ai_token = None
+            continue
 
         if game_state.winner_found and not game_state.game_over:
             if event.type == pygame.MOUSEBUTTONDOWN and game_state.restart_button_rect and game_state.restart_button_rect.collidepoint(event.pos):
@@ -125,6 +277,8 @@ def handle_events(
                     game_state.game_over = True
                 elif event.key in (pygame.K_SPACE, pygame.K_RETURN):
                     restart_game(game_state)
+                elif event.key == pygame.K_TAB and game_state.analysis is not None:
+                    game_state.show_analysis = not game_state.show_analysis
             return
 
         for cond, scr in [
@@ -144,66 +298,45 @@ def handle_events(
                 game_state.paused = True
                 return
             current_player = next(p for p in game_state.players if p.is_turn)
-            if not game_state.dropping:
+            if not game_state.dropping and not is_ai_turn(game_state):
                 if event.key == current_player.left_key:
                     current_player.move_left()
                 elif event.key == current_player.right_key:
-                    current_player.move_right()
-                elif event.key == current_player.drop_key and is_valid_location(game_state.board, current_player.current_col):
-                    row = get_next_open_row(game_state.board, current_player.current_col)
-                    game_state.dropping = True
-                    game_state.drop_col = current_player.current_col
-                    game_state.drop_row = row
-                    game_state.drop_y = (config.HEIGHT - (ROWS + 1) * SQUARE_SIZE)//2 + SQUARE_SIZE//2
+                    current_player.move_right(game_state.cols)
+                elif event.key == current_player.drop_key and game_state.bitboard.can_play(current_player.current_col):
+                    start_drop(game_state, current_player.current_col)
             return
         if game_state.paused:
             pause_screen.handle(game_state, event)
             return
 
-def create_board():
-    return np.zeros((ROWS, COLS), int)
-
-def is_valid_location(board, col):
-    return board[0][col] == 0
-
-def get_next_open_row(board, col):
-    for r in range(ROWS-1, -1, -1):
-        if board[r][col] == 0:
-            return r
-
-def draw_board(board, offset_x, offset_y):
-    winning_positions = get_winning_positions(board)
-    for c in range(COLS):
-        for r in range(ROWS):
-            color = {1: config.PURPLE, 2: config.LIGHT_BLUE}.get(board[r][c], config.BLACK)
-            x = offset_x + c * SQUARE_SIZE + SQUARE_SIZE // 2
-            y = offset_y + r * SQUARE_SIZE + SQUARE_SIZE + SQUARE_SIZE // 2
-            pygame.draw.circle(config.screen, config.WHITE, (x, y), RADIUS + 3)
-            pygame.draw.circle(config.screen, color, (x, y), RADIUS)
-    if winning_positions:
-        start_r, start_c = winning_positions[0]
-        end_r, end_c = winning_positions[-1]
-        pygame.draw.line(
-            config.screen,
-            config.WHITE,
-            (offset_x + start_c * SQUARE_SIZE + SQUARE_SIZE // 2,
-             offset_y + start_r * SQUARE_SIZE + SQUARE_SIZE + SQUARE_SIZE // 2),
-            (offset_x + end_c * SQUARE_SIZE + SQUARE_SIZE // 2,
-             offset_y + end_r * SQUARE_SIZE + SQUARE_SIZE + SQUARE_SIZE // 2),
-            8
-        )
+def create_board(rows=ROWS, cols=COLS):
+    return np.zeros((rows, cols), int)
+
+def draw_win_line(winning_positions, square, offset_x, offset_y):
+    start_r, start_c = winning_positions[0]
+    end_r, end_c = winning_positions[-1]
+    pygame.draw.line(
+        config.screen,
+        config.WHITE,
+        (offset_x + start_c * square + square // 2,
+         offset_y + start_r * square + square + square // 2),
+        (offset_x + end_c * square + square // 2,
+         offset_y + end_r * square + square + square // 2),
+        max(3, square // 12)
+    )
 
 # Draw the active piece at the top
-def draw_active_piece(piece, col, offset_x, offset_y):
+def draw_active_piece(piece, col, square, offset_x, offset_y):
     color = piece_color(piece)
-    pygame.draw.circle(
+    return pygame.draw.circle(
         config.screen,
         color,
         (
-            offset_x + col * SQUARE_SIZE + SQUARE_SIZE // 2,
-            offset_y + SQUARE_SIZE // 2
+            offset_x + col * square + square // 2,
+            offset_y + square // 2
         ),
-        RADIUS
+        piece_radius(square)
     )
 
 def restart_game(game_state):
@@ -211,7 +344,31 @@ def restart_game(game_state):
     game_state.game_started = False
     game_state.game_over = False
     game_state.winner_found = False
-    game_state.board = create_board()
+    game_state.winner = 0
+    game_state.winning_cells = []
+    stop_ai(game_state)
+    stop_analysis(game_state)
+    game_state.puzzle = None
+    game_state.set_board(*game_state.chosen_board)
+
+def update_drop(game_state, dt):
+    # Animate drop if in progress
+    if not game_state.dropping:
+        return
+    col, row, dy = game_state.drop_col, game_state.drop_row, game_state.drop_y
+    if col is not None and row is not None and dy is not None:
+        square, _, offset_y = board_geometry(game_state)
+        target_y = offset_y + (row+1)*square + square//2
+        game_state.drop_y = min(dy + DROP_SPEED * dt, target_y)
+        if game_state.drop_y == target_y:
+            cp = next(p for p in game_state.players if p.is_turn)
+            place_piece(game_state, col, cp.id)
+            check_winner(game_state, row, col)
+            [setattr(p, 'is_turn', not p.is_turn) for p in game_state.players]
+            game_state.dropping = False
+            game_state.drop_col = game_state.drop_row = game_state.drop_y = None
+            game_state.prev_drop_y = None
+            cp.current_col = game_state.cols // 2
 
 def draw_game(
         screen,
@@ -223,44 +380,30 @@ def draw_game(
         game_over_screen,
         go_to_menu_screen,
         choose_starting_player_screen,
+        alpha=1.0,
 ):
-    screen.fill(config.BLACK)
-    offset_x = (config.WIDTH - COLS * SQUARE_SIZE) // 2
-    offset_y = (config.HEIGHT - (ROWS + 1) * SQUARE_SIZE) // 2
-
-    if not game_state.game_over and not game_state.winner_found:
-        check_winner(game_state)
-
-    pygame.draw.rect(screen, config.WHITE, config.get_border(), width=config.border_width)
-    pygame.draw.rect(screen, config.get_rect_below_border_color(), config.get_rect_below_border())
-    draw_score(screen, game_state.players[0].score, game_state.players[1].score)
-
-    # Draw active piece at top if not dropping
-    if not game_state.dropping and not game_state.winner_found:
-        current_player = next(p for p in game_state.players if p.is_turn)
-        draw_active_piece(current_player.id, current_player.current_col, offset_x, offset_y)
+    square, offset_x, offset_y = board_geometry(game_state)
+    overlay = (
+        game_state.go_to_menu or game_state.show_settings or game_state.show_quit_confirmation
+        or game_state.choose_starting_player or game_state.paused or game_state.game_over
+        or game_state.winner_found
+    )
+    # While a game is in play only the active and the falling piece move; the
+    # background is redrawn when a piece lands or a score changes
+    bitboard = game_state.bitboard
+    key = (
+        bitboard.rows, bitboard.cols, *bitboard.boards, bitboard.mask, square,
+        game_state.players[0].score, game_state.players[1].score, puzzle_status(game_state),
+    )
+    if not overlay and dirty_rects.begin(screen, key, lambda surf: draw_background(surf, game_state, square, offset_x, offset_y)):
+        draw_moving(screen, game_state, square, offset_x, offset_y, alpha)
+        return
+    dirty_rects.full_frame()
 
-    draw_board(game_state.board, offset_x, offset_y)
-    # Draw the two white rectangles (board borders) after the board
-    pygame.draw.rect(screen, config.WHITE, pygame.Rect(offset_x - 25, offset_y + SQUARE_SIZE, SQUARE_SIZE * COLS + 50, SQUARE_SIZE * ROWS), width=3)
-    pygame.draw.rect(screen, config.WHITE, pygame.Rect(offset_x - 50, offset_y + SQUARE_SIZE * (ROWS + 1), SQUARE_SIZE * COLS + 100, 50), width=3)
-    # Draw falling piece if dropping, after board and borders
-    if game_state.dropping:
-        col = game_state.drop_col
-        drop_y = game_state.drop_y
-        current_player = next(p for p in game_state.players if p.is_turn)
-        piece = current_player.id
-        color = piece_color(piece)
-        if col is not None and drop_y is not None:
-            pygame.draw.circle(
-                config.screen,
-                color,
-                (
-                    offset_x + col * SQUARE_SIZE + SQUARE_SIZE // 2,
-                    int(drop_y)
-                ),
-                RADIUS
-            )
+    draw_background(screen, game_state, square, offset_x, offset_y)
+    if game_state.winning_cells:
+        draw_win_line(game_state.winning_cells, square, offset_x, offset_y)
+    draw_moving(screen, game_state, square, offset_x, offset_y, alpha)
 
     # Centralized overlays/screens
     for cond, scr in [
@@ -280,90 +423,221 @@ def draw_game(
         restart_rect = pygame.Rect(0, 0, *config.buttons['standard_size'])
         restart_rect.center = (config.WIDTH // 2, config.HEIGHT // 5)
         game_state.restart_button_rect = restart_rect
-        text = config.fonts['selected_button'].render('Restart', True, config.WHITE)
+        text = textCache.render(config.fonts['selected_button'], 'Restart', config.WHITE)
         screen.blit(text, text.get_rect(center=restart_rect.center))
+        if game_state.analysis is not None:
+            if game_state.show_analysis:
+                draw_analysis(screen, game_state, square, offset_x, offset_y)
+            else:
+                text = textCache.render(config.fonts['score'], 'Tab: Analysis', config.LIGHT_GREY)
+                screen.blit(text, text.get_rect(center=(config.WIDTH // 2, 50)))
+
+def draw_background(screen, game_state, square, offset_x, offset_y):
+    screen.fill(config.BLACK)
+    pygame.draw.rect(screen, config.WHITE, config.get_border(), width=config.border_width)
+    pygame.draw.rect(screen, config.get_rect_below_border_color(), config.get_rect_below_border())
+    draw_score(screen, game_state.players[0].score, game_state.players[1].score)
+    if game_state.puzzle is not None:
+        draw_puzzle_status(screen, game_state)
+    # Board, frame and placed pieces are one cached layer
+    board_renderer.draw(screen, game_state.bitboard, square, offset_x, offset_y)
+
+def draw_moving(screen, game_state, square, offset_x, offset_y, alpha=1.0):
+    # Active piece at the top if not dropping, else the falling piece in front
+    # of the board; their rects go to dirty_rects
+    if not game_state.dropping and not game_state.winner_found:
+        current_player = next(p for p in game_state.players if p.is_turn)
+        dirty_rects.add(draw_active_piece(current_player.id, current_player.current_col, square, offset_x, offset_y))
+    if game_state.dropping:
+        col = game_state.drop_col
+        drop_y = game_state.drop_y
+        if drop_y is not None and game_state.prev_drop_y is not None:
+            drop_y = game_state.prev_drop_y + (drop_y - game_state.prev_drop_y) * alpha
+        current_player = next(p for p in game_state.players if p.is_turn)
+        piece = current_player.id
+        color = piece_color(piece)
+        if col is not None and drop_y is not None:
+            dirty_rects.add(pygame.draw.circle(
+                screen,
+                color,
+                (
+                    offset_x + col * square + square // 2,
+                    int(drop_y)
+                ),
+                piece_radius(square)
+            ))
+
+def draw_analysis(screen, game_state, square, offset_x, offset_y):
+    # Number every move; blunders get a red ring, missed wins a blue one.
+    # Moves still being analysed, or whose analysis failed, are numbered in grey
+    analysis = game_state.analysis
+    filled = [0] * game_state.cols
+    for i, (col, player) in enumerate(game_state.bitboard.moves):
+        row = game_state.rows - 1 - filled[col]
+        filled[col] += 1
+        x = offset_x + col * square + square // 2
+        y = offset_y + (row + 1) * square + square // 2
+        result = analysis.results[i]
+        if result is not None and result['verdict'] in ('blunder', 'missed win'):
+            ring = config.RED if result['verdict'] == 'blunder' else config.BLUE
+            pygame.draw.circle(screen, ring, (x, y), piece_radius(square), width=max(3, square // 12))
+        color = config.LIGHT_GREY if result is None or result['verdict'] == 'failed' else config.WHITE
+        text = textCache.render(config.fonts['score'], str(i + 1), color)
+        screen.blit(text, text.get_rect(center=(x, y)))
+
+    # Progress between the scores, each player's mistakes below their score
+    text = textCache.render(config.fonts['score'], f'Analysis {analysis.finished()}/{len(analysis.results)}', config.LIGHT_GREY)
+    screen.blit(text, text.get_rect(center=(config.WIDTH // 2, 50)))
+    for i, player in enumerate((1, 2)):
+        summary = f'{analysis.count(player, "blunder")} blunders, {analysis.count(player, "missed win")} missed wins'
+        text = textCache.render(config.fonts['score'], summary, config.WHITE)
+        screen.blit(text, text.get_rect(center=(config.WIDTH//4*(1+2*i), 90)))
+
+def puzzle_status(game_state):
+    if game_state.puzzle is None:
+        return None
+    if not game_state.winner_found:
+        return f'Win in {puzzle_moves_left(game_state)}'
+    return 'Solved' if game_state.winner == 1 else 'Not solved'
+
+def draw_puzzle_status(screen, game_state):
+    text = textCache.render(config.fonts['score'], puzzle_status(game_state), config.LIGHT_GREY)
+    screen.blit(text, text.get_rect(center=(config.WIDTH // 2, 50)))
 
 def draw_score(screen, player1_wins, player2_wins):
     for i, score in enumerate([player1_wins, player2_wins]):
-        text = config.fonts['score'].render(str(score), True, config.WHITE)
+        text = textCache.render(config.fonts['score'], str(score), config.WHITE)
         rect = text.get_rect(center=(config.WIDTH//4*(1+2*i), 50))
         screen.blit(text, rect)
 
 
-def main():
-    pygame.init()
-
-    pygame.display.set_caption("Connect 4")
-
-    game_state = GameState()
-
-    quit_screen = screens.QuitScreen()
-    settings_screen = screens.SettingsScreen()
-    pause_screen = screens.PauseScreen()
-    start_screen = screens.StartScreen()
-    game_over_screen = screens.GameOverScreen(lambda: restart_game(game_state))
-    go_to_menu_screen = screens.GoToMenuScreen()
-    choose_starting_player_screen = screens.ChooseStartingPlayerScreen()
-
-    drop_speed = 18  # pixels per frame for falling piece
-
-    offset_y = (config.HEIGHT - (ROWS + 1) * SQUARE_SIZE) // 2
-    while True:
-        # Animate drop if in progress
-        if game_state.dropping:
-            col, row, dy = game_state.drop_col, game_state.drop_row, game_state.drop_y
-            if col is not None and row is not None and dy is not None:
-                target_y = offset_y + (row+1)*SQUARE_SIZE + SQUARE_SIZE//2
-                game_state.drop_y = min(dy + drop_speed, target_y)
-                if game_state.drop_y == target_y:
-                    cp = next(p for p in game_state.players if p.is_turn)
-                    game_state.board[row][col] = cp.id
-                    [setattr(p, 'is_turn', not p.is_turn) for p in game_state.players]
-                    game_state.dropping = False
-                    game_state.drop_col = game_state.drop_row = game_state.drop_y = None
-                    cp.current_col = 3
+class ConnectFourScene(scenes.Scene):
+    caption = "Connect 4"
+
+    def __init__(self):
+        # The opening book, puzzles, AI worker thread, engines and analysis
+        # pool live as long as the scene and are handed to every new game
+        self.book = OpeningBook.open()
+        self.ai = AIWorker()
+        self.puzzles = PuzzleSet.open()
+        self.engines = {}
+        self.analysis_pool = None
+
+        self.quit_screen = screens.QuitScreen()
+        self.settings_screen = screens.SettingsScreen()
+        self.pause_screen = screens.PauseScreen()
+        self.start_screen = screens.StartScreen()
+        self.game_over_screen = screens.GameOverScreen(lambda: restart_game(self.game_state))
+        self.go_to_menu_screen = screens.GoToMenuScreen()
+        opponents = ['human', *DIFFICULTIES, 'mcts']
+        if self.puzzles is not None:
+            opponents.append('puzzles')
+        self.choose_starting_player_screen = screens.ChooseStartingPlayerScreen(opponents, BOARD_SIZES)
+        self.menus = (
+            self.quit_screen, self.settings_screen, self.pause_screen, self.start_screen,
+            self.game_over_screen, self.go_to_menu_screen, self.choose_starting_player_screen,
+        )
+
+    def enter(self):
+        # A fresh game every time Connect 4 is opened, with the opponent and
+        # board still chosen on the start screen
+        super().enter()
+        game_state = self.game_state = GameState()
+        game_state.book = self.book
+        game_state.ai = self.ai
+        game_state.puzzles = self.puzzles
+        game_state.engines = self.engines
+        game_state.analysis_pool = self.analysis_pool
+        choose = self.choose_starting_player_screen
+        game_state.opponent = choose.opponents[choose.opponent]
+        game_state.choose_board(*choose.board_sizes[choose.board_size])
+        self.timestep = FixedTimestep()
+        dirty_rects.full_frame()
+
+    def exit(self):
+        stop_ai(self.game_state)
+        stop_analysis(self.game_state)
+        self.analysis_pool = self.game_state.analysis_pool
+
+    def quit(self):
+        # Wait for the worker thread before the engines and pools it may be
+        # using shut down
+        self.ai.close()
+        for engine in self.engines.values():
+            engine.close()
+        if self.analysis_pool is not None:
+            self.analysis_pool.shutdown(cancel_futures=True)
+
+    def tick(self, dt):
+        self.game_state.prev_drop_y = self.game_state.drop_y
+        update_drop(self.game_state, dt)
+
+    def animating(self):
+        # Only a falling piece moves on its own; moves, the computer's
+        # replies and menu input all arrive as events
+        return self.game_state.dropping
+
+    def frame(self, frame_time):
+        # Input first, so a frame that wakes up for an event already shows its effect
+        game_state = self.game_state
+        handle_events(
+            game_state,
+            self.quit_screen,
+            self.settings_screen,
+            self.pause_screen,
+            self.start_screen,
+            self.game_over_screen,
+            self.go_to_menu_screen,
+            self.choose_starting_player_screen,
+        )
+        if game_state.opponent == 'puzzles' and game_state.game_started and game_state.puzzle is None:
+            start_puzzle(game_state)
+        update_ai(game_state)
+        if game_state.analysis is not None:
+            game_state.analysis.poll()
+
+        if game_state.paused or not game_state.game_started or game_state.game_over or game_state.winner_found:
+            pygame.mouse.set_visible(True)
+        else:
+            pygame.mouse.set_visible(False)
+
+        dropping = game_state.dropping
+        alpha = self.timestep.advance(frame_time, self.tick)
+        if dropping and not game_state.dropping:
+            # The piece landed and the loop may go idle after this frame, so
+            # start the computer's search or ponder now instead of after the wait
+            update_ai(game_state)
 
         if not game_state.choose_starting_player:
             draw_game(
                 config.screen,
                 game_state,
-                pause_screen,
-                start_screen,
-                settings_screen,
-                quit_screen,
-                game_over_screen,
-                go_to_menu_screen,
-                choose_starting_player_screen,
+                self.pause_screen,
+                self.start_screen,
+                self.settings_screen,
+                self.quit_screen,
+                self.game_over_screen,
+                self.go_to_menu_screen,
+                self.choose_starting_player_screen,
+                alpha,
             )
         else:
+            dirty_rects.full_frame()
             config.screen.fill(config.BLACK)
             if game_state.show_settings:
-                settings_screen.draw_screen(config.screen)
+                self.settings_screen.draw_screen(config.screen)
             elif game_state.go_to_menu:
-                go_to_menu_screen.draw_screen(config.screen)
+                self.go_to_menu_screen.draw_screen(config.screen)
             elif game_state.show_quit_confirmation:
-                quit_screen.draw_screen(config.screen)
+                self.quit_screen.draw_screen(config.screen)
             else:
-                choose_starting_player_screen.draw_screen(config.screen)
+                self.choose_starting_player_screen.draw_screen(config.screen)
 
-        handle_events(
-            game_state,
-            quit_screen,
-            settings_screen,
-            pause_screen,
-            start_screen,
-            game_over_screen,
-            go_to_menu_screen,
-            choose_starting_player_screen,
-        )
+        dirty_rects.present()
 
-        if game_state.paused or not game_state.game_started or game_state.game_over or game_state.winner_found:
-            pygame.mouse.set_visible(True)
-        else:
-            pygame.mouse.set_visible(False)
-
-        pygame.display.update()
+def main():
+    scenes.manager.run(ConnectFourScene)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,464 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ProcessPoolExecutor
+
+from minigames.connectFourEngine import Bitboard
+
+# (seconds per move, maximum search depth, plays from the opening book,
+# searches on all cores) per difficulty
+DIFFICULTIES = {
+    'easy': (0.05, 2, False, False),
+    'medium': (0.25, 6, True, False),
+    'hard': (1.0, 42, True, True),
+}
+
+WIN_SCORE = 1_000_000  # a win at ply p scores WIN_SCORE - p
+WIN_BOUND = WIN_SCORE - 1000  # anything above this is a forced win
+TT_SIZE = 1 << 18  # transposition table slots, roughly 100 bytes each when full
+EXACT, LOWER, UPPER = 0, 1, 2
+CHECK_EVERY = 1024  # nodes between clock checks
+# Pools are started from the AI thread while pygame runs, so workers are
+# spawned fresh instead of forked from that state
+POOL_CONTEXT = multiprocessing.get_context('spawn')
+main_lock = threading.Lock()
+
+
+def pool_context(*tasks):
+    # Spawn context for a pool that runs tasks. A spawned worker runs the
+    # parent's main script again before its first task; for the game that is
+    # menu.py, which imports pygame and every game. Unless one of the tasks is
+    # defined in the main script, as when an engine module is run on its own,
+    # the workers are started without it
+    if any(task.__module__ == '__main__' for task in tasks):
+        return POOL_CONTEXT
+    return WorkerContext()
+
+
+class WorkerProcess(POOL_CONTEXT.Process):
+    def start(self):
+        # Spawn records the main script while the process starts, so hide it
+        # behind an empty module for that long
+        with main_lock:
+            main = sys.modules['__main__']
+            sys.modules['__main__'] = types.ModuleType('__main__')
+            try:
+                super().start()
+            finally:
+                sys.modules['__main__'] = main
+
+
+class WorkerContext(type(POOL_CONTEXT)):
+    Process = WorkerProcess
+
+
+def popcount(n):
+    return bin(n).count('1')
+
+
+def threats(stones, empty, connect, directions):
+    # Empty cells that would complete a line of connect stones for stones.
+    # For every way of leaving one cell of a window open, AND the shifted stones
+    # with the shifted empty cells; spare bits are never set in either, so
+    # windows never wrap from one column into the next
+    cells = 0
+    for d in directions:
+        for k in range(connect):
+            window = empty >> (k * d)
+            for i in range(connect):
+                if i != k:
+                    window &= stones >> (i * d)
+                    if not window:
+                        break
+            cells |= window << (k * d)
+    return cells & empty
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class TranspositionTable:
+    # Fixed number of slots indexed by the low bits of the Zobrist hash.
+    # Each slot stores (hash, depth, flag, score, move, generation). A new entry
+    # replaces the old one if that was written by an earlier search or was
+    # searched no deeper, so the table never grows and stale entries age out
+    def __init__(self, size=TT_SIZE):
+        self.size = size
+        self.slots = [None] * size
+        self.generation = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def get(self, key):
+        entry = self.slots[key & (self.size - 1)]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def put(self, key, depth, flag, score, move):
+        index = key & (self.size - 1)
+        entry = self.slots[index]
+        if entry is None or entry[5] != self.generation or depth >= entry[1]:
+            self.slots[index] = (key, depth, flag, score, move, self.generation)
+
+    def clear(self):
+        self.slots = [None] * self.size
+
+
+class Engine:
+    # Negamax alpha-beta search on Bitboard positions with iterative deepening,
+    # center-first move ordering and a Zobrist-hashed transposition table.
+    # After every search, nodes, depth, score and elapsed describe the last move.
+    # Positions found in the optional opening book are answered without searching.
+    # Setting stop_event ends a running search as if its time had run out
+    def __init__(self, time_limit=0.25, max_depth=6, tt_size=TT_SIZE, seed=0, book=None):
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.book = book
+        self.stop_event = threading.Event()
+        self.table = TranspositionTable(tt_size)
+        self.layout = None
+        self.seed = seed
+        self.nodes = 0
+        self.depth = 0
+        self.score = 0
+        self.elapsed = 0.0
+
+    @classmethod
+    def for_difficulty(cls, difficulty, book=None):
+        time_limit, max_depth, uses_book, parallel = DIFFICULTIES[difficulty]
+        if parallel and (os.cpu_count() or 1) > 1:
+            return ParallelEngine(time_limit, max_depth, book=book if uses_book else None)
+        return cls(time_limit, max_depth, book=book if uses_book else None)
+
+    def prepare(self, rows, cols, connect):
+        # Masks and Zobrist keys depend on the board size, so build them lazily
+        if self.layout == (rows, cols, connect):
+            return
+        self.layout = (rows, cols, connect)
+        h = rows + 1
+        self.rows, self.cols, self.connect = rows, cols, connect
+        self.directions = (1, h, h - 1, h + 1)
+        self.cells = rows * cols
+        column = (1 << rows) - 1
+        self.column_masks = [column << (c * h) for c in range(cols)]
+        self.bottom = sum(1 << (c * h) for c in range(cols))
+        self.board_mask = self.bottom * column
+        self.order = sorted(range(cols), key=lambda c: abs(2 * c - (cols - 1)))
+        self.center_mask = sum(self.column_masks[c] for c in self.order[:1 + (cols + 1) % 2])
+        # seeded per layout so pool workers derive the same keys as the parent
+        rng = random.Random(f'{self.seed}:{rows}x{cols}x{connect}')
+        self.zobrist = [[rng.getrandbits(64) for _ in range(h * cols)] for _ in range(2)]
+        self.table.clear()
+
+    def hash(self, bitboard):
+        key = 0
+        for side in (0, 1):
+            stones = bitboard.boards[side]
+            while stones:
+                low = stones & -stones
+                key ^= self.zobrist[side][low.bit_length() - 1]
+                stones ^= low
+        return key
+
+    def nodes_per_second(self):
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+    def best_move(self, bitboard, player, time_limit=None):
+        # Column to play for player (1 or 2), or None if the board is full
+        self.prepare(bitboard.rows, bitboard.cols, bitboard.connect)
+        self.table.new_search()
+        self.nodes = 0
+        self.depth = 0
+        self.start = time.perf_counter()
+        self.deadline = self.start + (self.time_limit if time_limit is None else time_limit)
+
+        if self.book is not None:
+            entry = self.book.lookup(bitboard, player)
+            if entry is not None and bitboard.can_play(entry[1]):
+                self.score, best = entry
+                self.elapsed = time.perf_counter() - self.start
+                return best
+
+        side = player - 1
+        current = bitboard.boards[side]
+        mask = bitboard.mask
+        moves = len(bitboard.moves)
+        key = self.hash(bitboard)
+        legal = [c for c in self.order if bitboard.can_play(c)]
+        if not legal:
+            return None
+
+        best = legal[0]
+        for depth in range(1, min(self.max_depth, self.cells - moves) + 1):
+            try:
+                score, move = self.search_root(current, mask, key, side, moves, depth)
+            except SearchTimeout:
+                break
+            best, self.score, self.depth = move, score, depth
+            if abs(score) > WIN_BOUND:
+                break
+        self.elapsed = time.perf_counter() - self.start
+        return best
+
+    def search_root(self, current, mask, key, side, moves, depth):
+        alpha = -WIN_SCORE
+        best_move = None
+        for col in self.ordered_moves(mask, key):
+            score = self.search_move(current, mask, key, side, moves, col, depth, alpha)
+            if best_move is None or score > alpha:
+                alpha, best_move = score, col
+        self.table.put(key, depth, EXACT, alpha, best_move)
+        return alpha, best_move
+
+    def search_move(self, current, mask, key, side, moves, col, depth, alpha):
+        # Score of playing col at the root; at or below alpha it is only an upper bound
+        move = (mask + self.bottom) & self.column_masks[col]
+        child_key = key ^ self.zobrist[side][move.bit_length() - 1]
+        return -self.negamax(current ^ mask, mask | move, child_key, 1 - side, moves + 1, depth - 1, -WIN_SCORE, -alpha, 1)
+
+    def score_move(self, bitboard, player, col, depth, time_limit=None):
+        # Exact score of player playing col, searched to the same depth as the
+        # root moves of a best_move that reached depth, so both share a horizon
+        self.prepare(bitboard.rows, bitboard.cols, bitboard.connect)
+        self.deadline = time.perf_counter() + (self.time_limit if time_limit is None else time_limit)
+        side = player - 1
+        return self.search_move(
+            bitboard.boards[side], bitboard.mask, self.hash(bitboard), side, len(bitboard.moves), col, depth, -WIN_SCORE
+        )
+
+    def expected_reply(self, bitboard, player):
+        # Best move for player according to the transposition table, or None
+        if self.layout != (bitboard.rows, bitboard.cols, bitboard.connect):
+            return None
+        entry = self.table.get(self.hash(bitboard))
+        if entry is not None and entry[4] is not None and bitboard.can_play(entry[4]):
+            return entry[4]
+        return None
+
+    def close(self):
+        # Only the parallel engine holds resources
+        pass
+
+    def ordered_moves(self, mask, key):
+        # Legal columns, the transposition table's best move first, then center out
+        playable = (mask + self.bottom) & self.board_mask
+        cols = [c for c in self.order if playable & self.column_masks[c]]
+        entry = self.table.get(key)
+        if entry is not None and entry[4] in cols:
+            cols.remove(entry[4])
+            cols.insert(0, entry[4])
+        return cols
+
+    def evaluate(self, current, mask):
+        # Static score for the side to move: open threats and center stones
+        empty = self.board_mask & ~mask
+        opponent = current ^ mask
+        mine = threats(current, empty, self.connect, self.directions)
+        theirs = threats(opponent, empty, self.connect, self.directions)
+        return (
+            10 * (popcount(mine) - popcount(theirs))
+            + 3 * (popcount(current & self.center_mask) - popcount(opponent & self.center_mask))
+        )
+
+    def negamax(self, current, mask, key, side, moves, depth, alpha, beta, ply):
+        # current holds the stones of the side to move; scores are from its view
+        self.nodes += 1
+        if self.nodes % CHECK_EVERY == 0 and (time.perf_counter() > self.deadline or self.stop_event.is_set()):
+            raise SearchTimeout
+
+        # The previous move may have won
+        opponent = current ^ mask
+        for d in self.directions:
+            m = opponent
+            for k in range(1, self.connect):
+                m &= opponent >> (k * d)
+            if m:
+                return -(WIN_SCORE - ply)
+        if moves == self.cells:
+            return 0
+        if depth == 0:
+            return self.evaluate(current, mask)
+
+        alpha_orig = alpha
+        entry = self.table.get(key)
+        if entry is not None and entry[1] >= depth:
+            score = entry[3]
+            if score > WIN_BOUND:
+                score -= ply
+            elif score < -WIN_BOUND:
+                score += ply
+            if entry[2] == EXACT:
+                return score
+            if entry[2] == LOWER:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if alpha >= beta:
+                return score
+
+        best_score, best_move = -WIN_SCORE, None
+        for col in self.ordered_moves(mask, key):
+            move = (mask + self.bottom) & self.column_masks[col]
+            child_key = key ^ self.zobrist[side][move.bit_length() - 1]
+            score = -self.negamax(opponent, mask | move, child_key, 1 - side, moves + 1, depth - 1, -beta, -alpha, ply + 1)
+            if score > best_score:
+                best_score, best_move = score, col
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        if best_score <= alpha_orig:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        stored = best_score
+        if stored > WIN_BOUND:
+            stored += ply
+        elif stored < -WIN_BOUND:
+            stored -= ply
+        self.table.put(key, depth, flag, stored, best_move)
+        return best_score
+
+
+worker_engine = None
+worker_root = None
+
+
+def init_worker(stop_event):
+    global worker_engine
+    worker_engine = Engine()
+    worker_engine.stop_event = stop_event
+
+
+def search_root_move(layout, current, mask, key, side, moves, col, depth, alpha, time_left):
+    # Runs in a pool worker. The worker keeps one engine, and with it its
+    # transposition table, for as long as the pool lives
+    global worker_root
+    engine = worker_engine
+    engine.prepare(*layout)
+    if worker_root != (current, mask):
+        worker_root = (current, mask)
+        engine.table.new_search()
+    engine.nodes = 0
+    engine.deadline = time.perf_counter() + time_left
+    try:
+        score = engine.search_move(current, mask, key, side, moves, col, depth, alpha)
+    except SearchTimeout:
+        score = None
+    return score, engine.nodes
+
+
+class ParallelEngine(Engine):
+    # Splits the search at the root moves over a process pool. The first move is
+    # searched alone to get a bound, then all remaining moves run in parallel
+    # against it (young brothers wait). nodes counts the nodes of all workers
+    def __init__(self, time_limit=1.0, max_depth=42, workers=None, **kwargs):
+        super().__init__(time_limit, max_depth, **kwargs)
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = None
+        # shared with the workers so stopping reaches them too
+        self.stop_event = POOL_CONTEXT.Event()
+
+    def search_root(self, current, mask, key, side, moves, depth):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(
+                self.workers, mp_context=pool_context(search_root_move, init_worker),
+                initializer=init_worker, initargs=(self.stop_event,)
+            )
+        cols = self.ordered_moves(mask, key)
+        args = (self.layout, current, mask, key, side, moves)
+
+        def run(col_list, alpha):
+            futures = [
+                self.pool.submit(search_root_move, *args, col, depth, alpha, self.deadline - time.perf_counter())
+                for col in col_list
+            ]
+            results = [future.result() for future in futures]
+            self.nodes += sum(nodes for _, nodes in results)
+            if any(score is None for score, _ in results):
+                raise SearchTimeout
+            return [score for score, _ in results]
+
+        alpha, best_move = run(cols[:1], -WIN_SCORE)[0], cols[0]
+        for col, score in zip(cols[1:], run(cols[1:], alpha)):
+            if score > alpha:
+                alpha, best_move = score, col
+        self.table.put(key, depth, EXACT, alpha, best_move)
+        return alpha, best_move
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+
+def benchmark():
+    # Searches a few positions at every difficulty and prints nodes per second
+    openings = [[], [3, 3, 3, 3], [3, 2, 4, 4, 2, 3, 1], [0, 6, 1, 5, 3, 3]]
+    for difficulty in DIFFICULTIES:
+        engine = Engine.for_difficulty(difficulty)
+        for opening in openings:
+            bitboard = Bitboard()
+            for i, col in enumerate(opening):
+                bitboard.play(col, i % 2 + 1)
+            move = engine.best_move(bitboard, len(opening) % 2 + 1)
+            print(
+                f'{difficulty:>6} {str(opening):<24} move {move}  depth {engine.depth:>2}  '
+                f'score {engine.score:>8}  {engine.nodes:>8} nodes  {engine.nodes_per_second():>9.0f} nodes/s'
+            )
+
+
+def speedup(max_workers=None, depth=10):
+    # Time to a fixed depth and depth reached in the hard time budget for a
+    # growing number of workers, compared with the single-process engine
+    max_workers = max_workers or os.cpu_count() or 1
+    openings = [[3, 3], [3, 2, 4, 4, 2, 3, 1], [3, 3, 3, 3, 2, 4]]
+    time_limit = DIFFICULTIES['hard'][0]
+
+    def measure(make_engine):
+        elapsed, depths = 0.0, []
+        for opening in openings:
+            bitboard = Bitboard()
+            for i, col in enumerate(opening):
+                bitboard.play(col, i % 2 + 1)
+            player = len(opening) % 2 + 1
+            engine = make_engine(float('inf'), depth)
+            engine.best_move(bitboard, player)
+            engine.close()
+            elapsed += engine.elapsed
+            engine = make_engine(time_limit, 42)
+            engine.best_move(bitboard, player)
+            engine.close()
+            depths.append(engine.depth)
+        return elapsed, sum(depths) / len(depths)
+
+    base, base_depth = measure(Engine)
+    print(f'serial     {base:7.2f}s to depth {depth}   avg depth in {time_limit}s: {base_depth:.1f}')
+    for workers in range(1, max_workers + 1):
+        elapsed, reached = measure(lambda t, d: ParallelEngine(t, d, workers=workers))
+        print(
+            f'{workers:2} workers {elapsed:7.2f}s to depth {depth}   avg depth in {time_limit}s: {reached:.1f}'
+            f'   speedup {base / elapsed:.2f}x'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the Connect 4 search')
+    parser.add_argument('--speedup', action='store_true', help='print the speedup curve of the parallel search')
+    parser.add_argument('--workers', type=int, default=None, help='largest worker count for --speedup')
+    parser.add_argument('--depth', type=int, default=10, help='fixed depth timed by --speedup')
+    args = parser.parse_args()
+    if args.speedup:
+        speedup(args.workers, args.depth)
+    else:
+        benchmark()
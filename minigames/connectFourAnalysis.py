@@ -0,0 +1,74 @@
+from minigames.connectFourEngine import Bitboard
+from minigames.connectFourAI import Engine, WIN_BOUND
+
+ANALYSIS_TIME = 0.5  # seconds per move
+ANALYSIS_DEPTH = 8
+BLUNDER_MARGIN = 30  # heuristic points lost by a move that count as a blunder
+
+
+def verdict(best_score, played_score):
+    # 'missed win', 'blunder' or 'good' for a move compared with the best one
+    if best_score > WIN_BOUND and played_score <= WIN_BOUND:
+        return 'missed win'
+    if played_score < -WIN_BOUND <= best_score or best_score - played_score >= BLUNDER_MARGIN:
+        return 'blunder'
+    return 'good'
+
+
+def analyse_move(rows, cols, connect, moves, index, time_limit=ANALYSIS_TIME, max_depth=ANALYSIS_DEPTH):
+    # Runs in a pool worker. Scores moves[index] of a game against the engine's
+    # best move in the same position, both from the mover's view and searched
+    # to the same depth
+    bitboard = Bitboard(rows, cols, connect)
+    for col, player in moves[:index]:
+        bitboard.play(col, player)
+    played, player = moves[index]
+    engine = Engine(time_limit, max_depth)
+    best = engine.best_move(bitboard, player)
+    best_score = engine.score
+    if played == best:
+        played_score = best_score
+    else:
+        # the depth was reached within the time limit, so this search ends too
+        played_score = engine.score_move(bitboard, player, played, max(engine.depth, 1), time_limit=float('inf'))
+    return {
+        'index': index,
+        'player': player,
+        'played': played,
+        'best': best,
+        'best_score': best_score,
+        'played_score': played_score,
+        'verdict': verdict(best_score, played_score),
+    }
+
+
+class GameAnalysis:
+    # Analysis of a finished game, one pool task per move. poll() collects
+    # whatever has finished without waiting, so the game loop can call it
+    # every frame and draw the moves as they come in. A move whose task
+    # failed, e.g. because a worker was killed, gets the verdict 'failed'
+    def __init__(self, pool, bitboard):
+        moves = self.moves = list(bitboard.moves)
+        self.results = [None] * len(moves)
+        self.futures = [
+            pool.submit(analyse_move, bitboard.rows, bitboard.cols, bitboard.connect, moves, i)
+            for i in range(len(moves))
+        ]
+
+    def poll(self):
+        for i, future in enumerate(self.futures):
+            if self.results[i] is None and future.done() and not future.cancelled():
+                try:
+                    self.results[i] = future.result()
+                except Exception:
+                    self.results[i] = {'index': i, 'player': self.moves[i][1], 'verdict': 'failed'}
+
+    def finished(self):
+        return sum(result is not None for result in self.results)
+
+    def count(self, player, kind):
+        return sum(1 for r in self.results if r is not None and r['player'] == player and r['verdict'] == kind)
+
+    def cancel(self):
+        for future in self.futures:
+            future.cancel()
@@ -0,0 +1,200 @@
+import time
+
+import numpy as np
+
+from minigames.connectFourEngine import CONNECT
+
+# Vectorized Connect 4 helpers for many positions at once. Boards are stacked
+# create_board() arrays of shape (n, rows, cols): row 0 is the top row,
+# 0 an empty cell, 1 and 2 the players' pieces
+
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+WIN_SCORE = 100_000
+
+
+def as_batch(boards):
+    boards = np.asarray(boards)
+    return boards[None] if boards.ndim == 2 else boards
+
+
+def windows(rows, cols, connect):
+    # For every direction, the connect slices that select the cells of all
+    # windows of connect cells in a row; window (i, j) is element [:, i, j]
+    # of every slice
+    for dr, dc in DIRECTIONS:
+        row_count = rows - (connect - 1) * dr
+        col_count = cols - (connect - 1) * abs(dc)
+        if row_count <= 0 or col_count <= 0:
+            continue
+        col_start = connect - 1 if dc < 0 else 0
+        yield [
+            (slice(None), slice(k * dr, k * dr + row_count), slice(col_start + k * dc, col_start + k * dc + col_count))
+            for k in range(connect)
+        ]
+
+
+def winners(boards, connect=CONNECT):
+    # Winner of every board, 0 if nobody has connect in a row yet
+    boards = as_batch(boards)
+    n, rows, cols = boards.shape
+    result = np.zeros(n, np.int8)
+    for player in (2, 1):
+        stones = boards == player
+        won = np.zeros(n, bool)
+        for cells in windows(rows, cols, connect):
+            line = stones[cells[0]]
+            for cell in cells[1:]:
+                line = line & stones[cell]
+            won |= line.any(axis=(1, 2))
+        result[won] = player
+    return result
+
+
+def legal_moves(boards):
+    # (n, cols) mask of the columns that still have room
+    return as_batch(boards)[:, 0, :] == 0
+
+
+def playable_cells(boards):
+    # (n, rows, cols) mask of the empty cells a piece would land in
+    boards = as_batch(boards)
+    empty = boards == 0
+    supported = np.ones_like(empty)
+    supported[:, :-1, :] = ~empty[:, 1:, :]
+    return empty & supported
+
+
+def threats(boards, player, connect=CONNECT):
+    # (n, rows, cols) mask of the empty cells that would complete a line for player
+    boards = as_batch(boards)
+    n, rows, cols = boards.shape
+    stones = boards == player
+    empty = boards == 0
+    result = np.zeros(boards.shape, bool)
+    for cells in windows(rows, cols, connect):
+        count = sum(stones[cell].astype(np.int8) for cell in cells)
+        open_windows = count == connect - 1
+        for cell in cells:
+            result[cell] |= open_windows & empty[cell]
+    return result
+
+
+def immediate_threats(boards, player, connect=CONNECT):
+    # (n, cols) mask of the columns player wins by playing into right now
+    boards = as_batch(boards)
+    return (threats(boards, player, connect) & playable_cells(boards)).any(axis=1)
+
+
+def scores(boards, connect=CONNECT):
+    # Heuristic score of every board from player 1's view. Every window that
+    # holds only one player's pieces counts 4 ** (pieces - 1) for that player,
+    # pieces in the center column count 3 each and a won board is +-WIN_SCORE
+    boards = as_batch(boards)
+    n, rows, cols = boards.shape
+    weights = np.array([0] + [4 ** (k - 1) for k in range(1, connect)] + [0])
+    total = np.zeros(n, np.int64)
+    for cells in windows(rows, cols, connect):
+        ones = sum((boards[cell] == 1).astype(np.int8) for cell in cells)
+        twos = sum((boards[cell] == 2).astype(np.int8) for cell in cells)
+        window_score = np.where(twos == 0, weights[ones], 0) - np.where(ones == 0, weights[twos], 0)
+        total += window_score.sum(axis=(1, 2))
+    center = boards[:, :, cols // 2]
+    total += 3 * ((center == 1).sum(axis=1) - (center == 2).sum(axis=1))
+    won = winners(boards, connect)
+    total[won == 1] = WIN_SCORE
+    total[won == 2] = -WIN_SCORE
+    return total
+
+
+def evaluate(boards, connect=CONNECT):
+    # Everything above for a whole batch at once
+    boards = as_batch(boards)
+    return {
+        'winner': winners(boards, connect),
+        'legal': legal_moves(boards),
+        'threats': np.stack([immediate_threats(boards, player, connect) for player in (1, 2)], axis=1),
+        'score': scores(boards, connect),
+    }
+
+
+def wins_at(boards, games, rows, cols, players, connect):
+    # For the given games, whether the piece just placed at (rows, cols)
+    # completes a line of connect pieces of players
+    n_rows, n_cols = boards.shape[1:]
+    won = np.zeros(len(games), bool)
+    for dr, dc in DIRECTIONS:
+        count = np.ones(len(games), int)
+        for sign in (1, -1):
+            run = np.ones(len(games), bool)
+            for k in range(1, connect):
+                r = rows + sign * k * dr
+                c = cols + sign * k * dc
+                run &= (r >= 0) & (r < n_rows) & (c >= 0) & (c < n_cols)
+                if not run.any():
+                    break
+                run[run] = boards[games[run], r[run], c[run]] == players[run]
+                count += run
+        won |= count >= connect
+    return won
+
+
+def playouts(boards, filled, to_move, connect, rng):
+    # Plays every board in the batch to the end with uniformly random moves.
+    # filled is the number of pieces per column and to_move the player on
+    # turn; all three arrays are updated in place. Returns the winner of every
+    # game, 0 for a draw
+    n, rows, cols = boards.shape
+    winners = np.zeros(n, np.int8)
+    active = np.arange(n)
+    while active.size:
+        legal = filled[active] < rows
+        active = active[legal.any(axis=1)]
+        if not active.size:
+            break
+        legal = filled[active] < rows
+        col = (rng.random(legal.shape) * legal).argmax(axis=1)
+        row = rows - 1 - filled[active, col]
+        players = to_move[active]
+        boards[active, row, col] = players
+        filled[active, col] += 1
+        won = wins_at(boards, active, row, col, players, connect)
+        winners[active[won]] = players[won]
+        to_move[active] = 3 - players
+        active = active[~won]
+    return winners
+
+
+def random_positions(n, rows=6, cols=7, connect=CONNECT, seed=None):
+    # n positions after a random number of random moves, for testing and
+    # benchmarks; play does not stop at a win
+    rng = np.random.default_rng(seed)
+    boards = np.zeros((n, rows, cols), np.int8)
+    filled = np.zeros((n, cols), int)
+    to_move = np.ones(n, np.int8)
+    stop = rng.integers(0, rows * cols, n)
+    for ply in range(rows * cols):
+        active = np.flatnonzero((stop > ply) & (filled < rows).any(axis=1))
+        if not active.size:
+            break
+        legal = filled[active] < rows
+        col = (rng.random(legal.shape) * legal).argmax(axis=1)
+        boards[active, rows - 1 - filled[active, col], col] = to_move[active]
+        filled[active, col] += 1
+        to_move[active] = 3 - to_move[active]
+    return boards
+
+
+def benchmark(n=10_000):
+    boards = random_positions(n, seed=0)
+    start = time.perf_counter()
+    result = evaluate(boards)
+    elapsed = time.perf_counter() - start
+    print(
+        f'evaluated {n} boards in {elapsed * 1000:.0f} ms ({n / elapsed:,.0f} boards/s), '
+        f'{np.count_nonzero(result["winner"])} decided, '
+        f'{np.count_nonzero(result["threats"].any(axis=2))} immediate threats'
+    )
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,163 @@
+import argparse
+import mmap
+import os
+import struct
+import time
+
+from minigames.connectFourEngine import Bitboard, ROWS, COLS, CONNECT
+from minigames.connectFourAI import Engine, WIN_SCORE, WIN_BOUND
+
+BOOK_PATH = os.path.join(os.path.dirname(__file__), 'connectFourBook.bin')
+MAGIC = b'C4BK'
+# magic, format version, rows, cols, connect, number of records
+HEADER = struct.Struct('<4sBBBBI')
+# position key, score for the side to move, best column
+RECORD = struct.Struct('<Qhb')
+VERSION = 1
+BOOK_PLIES = 4  # positions with up to this many stones go into the book
+SEARCH_DEPTH = 10  # plies searched per book position
+MAX_SCORE = 30000  # book scores are clamped to int16; wins keep their distance
+
+
+def position_key(bitboard, player):
+    # Unique key for a position with player to move: the mover's stones plus
+    # the occupied mask. Columns never carry into each other thanks to the spare bit
+    return bitboard.boards[player - 1] + bitboard.mask
+
+
+def mirror_key(key, rows, cols):
+    h = rows + 1
+    column = (1 << h) - 1
+    mirrored = 0
+    for c in range(cols):
+        mirrored |= ((key >> (c * h)) & column) << ((cols - 1 - c) * h)
+    return mirrored
+
+
+def canonical_key(bitboard, player):
+    # (key, mirrored) for the smaller of a position and its mirror image
+    key = position_key(bitboard, player)
+    mirrored = mirror_key(key, bitboard.rows, bitboard.cols)
+    if mirrored < key:
+        return mirrored, True
+    return key, False
+
+
+def book_score(score):
+    if score > WIN_BOUND:
+        return MAX_SCORE - (WIN_SCORE - score)
+    if score < -WIN_BOUND:
+        return -MAX_SCORE + (WIN_SCORE + score)
+    return max(-MAX_SCORE + 1000, min(MAX_SCORE - 1000, score))
+
+
+class OpeningBook:
+    # Read-only view of a book file. The file is memory-mapped and only the
+    # header is read up front; lookups binary-search the sorted records in place
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.rows, self.cols, self.connect, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{path} is not a Connect 4 book')
+
+    @classmethod
+    def open(cls, path=BOOK_PATH):
+        # The book is optional, without a file the engine just searches
+        try:
+            return cls(path)
+        except (OSError, ValueError):
+            return None
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def record(self, i):
+        return RECORD.unpack_from(self.data, HEADER.size + i * RECORD.size)
+
+    def find(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record = self.record(mid)
+            if record[0] < key:
+                lo = mid + 1
+            elif record[0] > key:
+                hi = mid
+            else:
+                return record
+        return None
+
+    def lookup(self, bitboard, player):
+        # (score, column) for player to move, or None if the position is not in the book
+        if (bitboard.rows, bitboard.cols, bitboard.connect) != (self.rows, self.cols, self.connect):
+            return None
+        key, mirrored = canonical_key(bitboard, player)
+        record = self.find(key)
+        if record is None:
+            return None
+        _, score, col = record
+        return score, self.cols - 1 - col if mirrored else col
+
+
+def book_positions(plies, rows=ROWS, cols=COLS, connect=CONNECT):
+    # Every position with at most plies stones that is not already decided,
+    # one per mirror pair, as (key, move list) with player 1 always starting
+    positions = {}
+    frontier = [[]]
+    for ply in range(plies + 1):
+        next_frontier = []
+        for moves in frontier:
+            bitboard = Bitboard(rows, cols, connect)
+            for i, col in enumerate(moves):
+                bitboard.play(col, i % 2 + 1)
+            if bitboard.winner():
+                continue
+            key, _ = canonical_key(bitboard, ply % 2 + 1)
+            if key in positions:
+                continue
+            positions[key] = moves
+            if ply < plies:
+                next_frontier.extend(moves + [c] for c in range(cols) if bitboard.can_play(c))
+        frontier = next_frontier
+    return positions
+
+
+def generate(path=BOOK_PATH, plies=BOOK_PLIES, depth=SEARCH_DEPTH, rows=ROWS, cols=COLS, connect=CONNECT):
+    if (rows + 1) * cols > 64:
+        raise ValueError('position keys only fit boards with (rows + 1) * cols <= 64')
+    positions = book_positions(plies, rows, cols, connect)
+    engine = Engine(time_limit=float('inf'), max_depth=depth)
+    records = []
+    start = time.perf_counter()
+    for n, (key, moves) in enumerate(sorted(positions.items()), 1):
+        bitboard = Bitboard(rows, cols, connect)
+        for i, col in enumerate(moves):
+            bitboard.play(col, i % 2 + 1)
+        player = len(moves) % 2 + 1
+        col = engine.best_move(bitboard, player)
+        if canonical_key(bitboard, player)[1]:
+            col = cols - 1 - col
+        records.append((key, book_score(engine.score), col))
+        if n % 100 == 0:
+            print(f'{n}/{len(positions)} positions, {time.perf_counter() - start:.0f}s')
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, rows, cols, connect, len(records)))
+        for record in records:
+            f.write(RECORD.pack(*record))
+    print(f'wrote {len(records)} positions to {path} in {time.perf_counter() - start:.0f}s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate the Connect 4 opening book')
+    parser.add_argument('--plies', type=int, default=BOOK_PLIES, help='book positions with up to this many stones')
+    parser.add_argument('--depth', type=int, default=SEARCH_DEPTH, help='search depth per position')
+    parser.add_argument('--out', default=BOOK_PATH)
+    args = parser.parse_args()
+    generate(args.out, args.plies, args.depth)
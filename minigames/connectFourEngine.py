@@ -0,0 +1,146 @@
+ROWS, COLS = 6, 7
+CONNECT = 4
+
+
+class Bitboard:
+    # Connect 4 position as one integer bitboard per player.
+    # Bits are laid out column by column, bottom to top, with one spare bit on
+    # top of every column so shifts never wrap from one column into the next:
+    #
+    #   6 13 20 27 34 41 48   <- spare row
+    #   5 12 19 26 33 40 47
+    #   ...
+    #   0  7 14 21 28 35 42   <- bottom row
+    #
+    # Python ints have no width limit, so larger boards work the same way.
+    def __init__(self, rows=ROWS, cols=COLS, connect=CONNECT):
+        self.rows = rows
+        self.cols = cols
+        self.connect = connect
+        self.height = rows + 1  # bits per column
+        self.boards = [0, 0]  # stones of player 1 and player 2
+        self.mask = 0
+        self.heights = [c * self.height for c in range(cols)]  # next free bit per column
+        self.moves = []
+        # shifts for vertical, horizontal and both diagonals
+        self.directions = (1, self.height, self.height - 1, self.height + 1)
+
+    @classmethod
+    def from_array(cls, board, connect=CONNECT):
+        # Build from a create_board() style array, row 0 at the top
+        rows, cols = len(board), len(board[0])
+        bitboard = cls(rows, cols, connect)
+        for c in range(cols):
+            for r in range(rows - 1, -1, -1):
+                player = int(board[r][c])
+                if player == 0:
+                    break
+                bitboard.play(c, player)
+        return bitboard
+
+    def copy(self):
+        other = Bitboard(self.rows, self.cols, self.connect)
+        other.boards = self.boards[:]
+        other.mask = self.mask
+        other.heights = self.heights[:]
+        other.moves = self.moves[:]
+        return other
+
+    def bit(self, row, col):
+        # bit of board cell (row, col), row 0 at the top
+        return 1 << (col * self.height + self.rows - 1 - row)
+
+    def cell(self, index):
+        # board cell (row, col) of a bit index
+        col, row = divmod(index, self.height)
+        return self.rows - 1 - row, col
+
+    def can_play(self, col):
+        return self.heights[col] < col * self.height + self.rows
+
+    def next_open_row(self, col):
+        if not self.can_play(col):
+            return None
+        return self.rows - 1 - (self.heights[col] - col * self.height)
+
+    def play(self, col, player):
+        # Drop a stone of player (1 or 2) into col; returns the board row it lands in
+        index = self.heights[col]
+        move = 1 << index
+        self.boards[player - 1] |= move
+        self.mask |= move
+        self.heights[col] += 1
+        self.moves.append((col, player))
+        return self.cell(index)[0]
+
+    def undo(self):
+        col, player = self.moves.pop()
+        self.heights[col] -= 1
+        move = 1 << self.heights[col]
+        self.boards[player - 1] ^= move
+        self.mask ^= move
+        return col
+
+    def is_full(self):
+        return len(self.moves) == self.rows * self.cols
+
+    def line_starts(self, stones, shift):
+        # bits where connect stones in a row start in direction shift
+        m = stones
+        for k in range(1, self.connect):
+            m &= stones >> (k * shift)
+            if not m:
+                break
+        return m
+
+    def has_won(self, player):
+        stones = self.boards[player - 1]
+        return any(self.line_starts(stones, d) for d in self.directions)
+
+    def winner(self):
+        for player in (1, 2):
+            if self.has_won(player):
+                return player
+        return 0
+
+    def winning_cells(self, player):
+        # Board cells of one winning line of player, or [] if there is none
+        stones = self.boards[player - 1]
+        for d in self.directions:
+            starts = self.line_starts(stones, d)
+            if starts:
+                start = (starts & -starts).bit_length() - 1
+                return [self.cell(start + k * d) for k in range(self.connect)]
+        return []
+
+    def line_through(self, row, col):
+        # Cells of a line of at least connect stones through board cell (row, col),
+        # or [] if that cell is not part of one. Only looks at lines through that cell
+        index = col * self.height + self.rows - 1 - row
+        if not self.mask >> index & 1:
+            return []
+        stones = self.boards[0] if self.boards[0] >> index & 1 else self.boards[1]
+        for d in self.directions:
+            line = [index]
+            i = index - d
+            while i >= 0 and stones >> i & 1:
+                line.insert(0, i)
+                i -= d
+            i = index + d
+            while stones >> i & 1:
+                line.append(i)
+                i += d
+            if len(line) >= self.connect:
+                return [self.cell(i) for i in line]
+        return []
+
+    def to_array(self):
+        board = [[0] * self.cols for _ in range(self.rows)]
+        for player in (1, 2):
+            stones = self.boards[player - 1]
+            while stones:
+                low = stones & -stones
+                r, c = self.cell(low.bit_length() - 1)
+                board[r][c] = player
+                stones ^= low
+        return board
@@ -0,0 +1,207 @@
+import math
+import threading
+import time
+
+import numpy as np
+
+from minigames.connectFourEngine import Bitboard
+from minigames.connectFourBatch import playouts
+
+LEAVES = 16  # leaves selected per batch
+BATCH = 16  # random playouts from every leaf
+EXPLORATION = 1.4  # UCT exploration constant
+MAX_NODES = 200_000  # the tree stops growing here and only refines its statistics
+
+
+class Node:
+    __slots__ = ('move', 'player', 'children', 'untried', 'visits', 'wins', 'terminal')
+
+    def __init__(self, move, player, untried, terminal=None):
+        self.move = move  # column played to reach this node
+        self.player = player  # player who played it
+        self.children = {}
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0  # from the view of player, draws count half
+        self.terminal = terminal  # winner (0 for a draw) if the game is over here
+
+    def select(self):
+        log_visits = math.log(self.visits)
+        return max(
+            self.children.values(),
+            key=lambda child: child.wins / child.visits + EXPLORATION * math.sqrt(log_visits / child.visits),
+        )
+
+
+class MCTSEngine:
+    # UCT search whose playouts run LEAVES * BATCH at a time, vectorized with numpy.
+    # Strength grows smoothly with the time budget and nothing in it depends on
+    # the board size. The tree is kept between moves: if the new position
+    # follows from the old root, the matching subtree becomes the new root.
+    # Same interface as connectFourAI.Engine; nodes counts playouts
+    def __init__(self, time_limit=1.0, leaves=LEAVES, batch=BATCH, seed=None):
+        self.time_limit = time_limit
+        self.leaves = leaves
+        self.batch = batch
+        self.rng = np.random.default_rng(seed)
+        self.stop_event = threading.Event()
+        self.root = None
+        self.root_moves = None
+        self.layout = None
+        self.size = 0  # nodes in the tree
+        self.nodes = 0
+        self.depth = 0
+        self.score = 0
+        self.elapsed = 0.0
+
+    def nodes_per_second(self):
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+    def new_node(self, bitboard, move, player, row):
+        self.size += 1
+        if bitboard.line_through(row, move):
+            return Node(move, player, [], terminal=player)
+        if bitboard.is_full():
+            return Node(move, player, [], terminal=0)
+        untried = [c for c in range(bitboard.cols) if bitboard.can_play(c)]
+        return Node(move, player, untried)
+
+    def find_root(self, bitboard, player):
+        # Reuse the subtree of the current position if there is one
+        moves = [col for col, _ in bitboard.moves]
+        old = self.root_moves
+        if self.root is not None and old is not None and moves[:len(old)] == old and self.layout == (bitboard.rows, bitboard.cols, bitboard.connect):
+            node = self.root
+            for col in moves[len(old):]:
+                node = node.children.get(col)
+                if node is None:
+                    break
+            else:
+                if node.player != player:
+                    self.root, self.root_moves = node, moves
+                    self.size = self.count(node)
+                    return node
+        self.layout = (bitboard.rows, bitboard.cols, bitboard.connect)
+        self.size = 1
+        self.root = Node(None, 3 - player, [c for c in range(bitboard.cols) if bitboard.can_play(c)])
+        self.root_moves = moves
+        return self.root
+
+    def count(self, node):
+        size, stack = 0, [node]
+        while stack:
+            node = stack.pop()
+            size += 1
+            stack.extend(node.children.values())
+        return size
+
+    def find_node(self, bitboard):
+        # Tree node of bitboard's position, or None if it is not in the tree
+        if self.root is None:
+            return None
+        moves = [col for col, _ in bitboard.moves]
+        if moves[:len(self.root_moves)] != self.root_moves:
+            return None
+        node = self.root
+        for col in moves[len(self.root_moves):]:
+            node = node.children.get(col)
+            if node is None:
+                return None
+        return node
+
+    def best_move(self, bitboard, player, time_limit=None):
+        # Column to play for player (1 or 2), or None if the board is full
+        start = time.perf_counter()
+        deadline = start + (self.time_limit if time_limit is None else time_limit)
+        if not any(bitboard.can_play(c) for c in range(bitboard.cols)):
+            return None
+        root = self.find_root(bitboard, player)
+        self.nodes = 0
+        self.depth = 0
+        while time.perf_counter() < deadline and not self.stop_event.is_set():
+            self.iterate(root, bitboard)
+        self.elapsed = time.perf_counter() - start
+
+        if not root.children:
+            return root.untried[0]
+        best = max(root.children.values(), key=lambda child: child.visits)
+        self.score = round(100 * best.wins / best.visits)  # win percentage
+        return best.move
+
+    def select_leaf(self, root, bitboard):
+        # Walk down by UCT and expand one untried move; returns (board, path)
+        board = bitboard.copy()
+        node, path = root, [root]
+        while not node.untried and node.children and node.terminal is None:
+            node = node.select()
+            board.play(node.move, node.player)
+            path.append(node)
+        if node.untried and node.terminal is None and self.size < MAX_NODES:
+            col = node.untried.pop(self.rng.integers(len(node.untried)))
+            player = 3 - node.player
+            row = board.play(col, player)
+            child = self.new_node(board, col, player, row)
+            node.children[col] = child
+            path.append(child)
+        self.depth = max(self.depth, len(path) - 1)
+        return board, path
+
+    def iterate(self, root, bitboard):
+        # Select LEAVES leaves and run BATCH playouts from each in one vectorized batch.
+        # Visits are counted as soon as a leaf is selected, which works as a
+        # virtual loss and spreads the leaves of one batch over the tree
+        leaves = []
+        for _ in range(self.leaves):
+            board, path = self.select_leaf(root, bitboard)
+            for visited in path:
+                visited.visits += self.batch
+            leaves.append((board, path))
+
+        open_leaves = [(board, path) for board, path in leaves if path[-1].terminal is None]
+        if open_leaves:
+            boards = np.repeat(np.array([board.to_array() for board, _ in open_leaves], np.int8), self.batch, axis=0)
+            filled = np.repeat(
+                np.array([[h - c * board.height for c, h in enumerate(board.heights)] for board, _ in open_leaves]),
+                self.batch, axis=0,
+            )
+            to_move = np.repeat(np.array([3 - path[-1].player for _, path in open_leaves], np.int8), self.batch)
+            winners = playouts(boards, filled, to_move, bitboard.connect, self.rng).reshape(len(open_leaves), self.batch)
+            p1_wins = iter(np.count_nonzero(winners == 1, axis=1) + 0.5 * np.count_nonzero(winners == 0, axis=1))
+        self.nodes += len(leaves) * self.batch
+
+        for board, path in leaves:
+            terminal = path[-1].terminal
+            if terminal is None:
+                wins = next(p1_wins)
+            else:
+                wins = self.batch * (1.0 if terminal == 1 else 0.5 if terminal == 0 else 0.0)
+            for visited in path:
+                visited.wins += wins if visited.player == 1 else self.batch - wins
+
+    def expected_reply(self, bitboard, player):
+        # Most visited move for player in bitboard's position, or None
+        node = self.find_node(bitboard)
+        if node is None or not node.children:
+            return None
+        return max(node.children.values(), key=lambda child: child.visits).move
+
+    def close(self):
+        pass
+
+
+def benchmark():
+    # Playouts per second and chosen moves for a few positions
+    engine = MCTSEngine(time_limit=1.0, seed=0)
+    for rows, cols, connect, opening in [(6, 7, 4, []), (6, 7, 4, [3, 3, 3, 3]), (6, 7, 4, [0, 6, 1, 5, 3, 3]), (10, 12, 5, [])]:
+        bitboard = Bitboard(rows, cols, connect)
+        for i, col in enumerate(opening):
+            bitboard.play(col, i % 2 + 1)
+        move = engine.best_move(bitboard, len(opening) % 2 + 1)
+        print(
+            f'{rows}x{cols} connect {connect} {str(opening):<20} move {move}  win {engine.score:>3}%  '
+            f'depth {engine.depth:>2}  {engine.nodes:>7} playouts  {engine.nodes_per_second():>8.0f} playouts/s'
+        )
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,187 @@
+import argparse
+import mmap
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from minigames.connectFourEngine import Bitboard, ROWS, COLS, CONNECT
+from minigames.connectFourAI import Engine, WIN_SCORE, WIN_BOUND, pool_context
+from minigames.connectFourBatch import random_positions, winners, legal_moves, immediate_threats
+from minigames.connectFourBook import canonical_key
+
+PUZZLE_PATH = os.path.join(os.path.dirname(__file__), 'connectFourPuzzles.bin')
+MAGIC = b'C4PZ'
+# magic, format version, rows, cols, connect, longest win in the file
+HEADER = struct.Struct('<4sBBBBB')
+# stones of the side to move, stones of the other side, winning column
+RECORD = struct.Struct('<QQb')
+VERSION = 1
+MAX_MOVES = 4  # puzzles are wins in 1 to MAX_MOVES moves
+PER_LEVEL = 100  # puzzles kept per number of moves
+SAMPLE = 2000  # random positions sampled per round
+
+
+def index_struct(max_moves):
+    # After the header: the first record of every level, plus the record count
+    return struct.Struct(f'<{max_moves + 1}I')
+
+
+def puzzle_bitboard(rows, cols, connect, mover, opponent):
+    # Bitboard of a puzzle with the side to move as player 1. The stones are
+    # played column by column, bottom to top, so moves is not a real game
+    bitboard = Bitboard(rows, cols, connect)
+    for col in range(cols):
+        for row in range(rows):
+            bit = 1 << (col * bitboard.height + row)
+            if mover & bit:
+                bitboard.play(col, 1)
+            elif opponent & bit:
+                bitboard.play(col, 2)
+            else:
+                break
+    return bitboard
+
+
+class PuzzleSet:
+    # Read-only view of a puzzle file. Records are grouped by the number of
+    # moves to the win and have a fixed size, so any puzzle is read directly
+    # from the memory-mapped file without scanning or solving anything
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.rows, self.cols, self.connect, self.max_moves = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{path} is not a Connect 4 puzzle file')
+        index = index_struct(self.max_moves)
+        self.starts = index.unpack_from(self.data, HEADER.size)
+        self.records = HEADER.size + index.size
+
+    @classmethod
+    def open(cls, path=PUZZLE_PATH):
+        # Puzzles are optional, without a file the mode is not offered
+        try:
+            return cls(path)
+        except (OSError, ValueError):
+            return None
+
+    def __len__(self):
+        return self.starts[-1]
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def count(self, moves):
+        # Number of puzzles that are won in moves moves
+        return self.starts[moves] - self.starts[moves - 1]
+
+    def levels(self):
+        return [moves for moves in range(1, self.max_moves + 1) if self.count(moves)]
+
+    def get(self, moves, i):
+        # (bitboard with player 1 to move, winning column) of puzzle i of a level
+        mover, opponent, col = RECORD.unpack_from(self.data, self.records + (self.starts[moves - 1] + i) * RECORD.size)
+        return puzzle_bitboard(self.rows, self.cols, self.connect, mover, opponent), col
+
+
+solver = None
+
+
+def solve(task):
+    # Runs in a pool worker. (moves, column) if the side to move wins in at
+    # most max_moves moves and only one column does so, else None
+    global solver
+    rows, cols, connect, mover, opponent, max_moves = task
+    if solver is None:
+        solver = Engine(time_limit=float('inf'))
+    bitboard = puzzle_bitboard(rows, cols, connect, mover, opponent)
+    solver.max_depth = 2 * max_moves - 1
+    col = solver.best_move(bitboard, 1)
+    if solver.score <= WIN_BOUND:
+        return None
+    plies = WIN_SCORE - solver.score
+    # Every other column must fail to win as quickly
+    for other in range(cols):
+        if other == col or not bitboard.can_play(other):
+            continue
+        row = bitboard.play(other, 1)
+        if bitboard.line_through(row, other):
+            return None
+        if plies > 1 and not bitboard.is_full():
+            solver.max_depth = plies - 1
+            solver.best_move(bitboard, 2)
+            if solver.score < -WIN_BOUND:
+                return None
+        bitboard.undo()
+    return (plies + 1) // 2, col
+
+
+def sample_positions(n, rows, cols, connect, seed, immediate=True):
+    # (key, mover, opponent) stones of random undecided positions. Without
+    # immediate, positions the side to move wins with one stone are left out
+    boards = random_positions(n, rows, cols, connect, seed)
+    keep = (winners(boards, connect) == 0) & legal_moves(boards).any(axis=1)
+    if not immediate:
+        player_two = (boards == 1).sum(axis=(1, 2)) > (boards == 2).sum(axis=(1, 2))
+        wins = np.where(player_two, immediate_threats(boards, 2, connect).any(axis=1), immediate_threats(boards, 1, connect).any(axis=1))
+        keep &= ~wins
+    boards = boards[keep]
+    positions = []
+    for board in boards:
+        bitboard = Bitboard.from_array(board, connect)
+        player = len(bitboard.moves) % 2 + 1
+        positions.append((canonical_key(bitboard, player)[0], bitboard.boards[player - 1], bitboard.boards[2 - player]))
+    return positions
+
+
+def generate(path=PUZZLE_PATH, max_moves=MAX_MOVES, per_level=PER_LEVEL, rows=ROWS, cols=COLS, connect=CONNECT, workers=None):
+    if (rows + 1) * cols > 64:
+        raise ValueError('puzzle records only fit boards with (rows + 1) * cols <= 64')
+    levels = {moves: [] for moves in range(1, max_moves + 1)}
+    seen = set()
+    start = time.perf_counter()
+    with ProcessPoolExecutor(workers, mp_context=pool_context(solve)) as pool:
+        for seed in range(1000):
+            if all(len(puzzles) >= per_level for puzzles in levels.values()):
+                break
+            tasks = []
+            # Wins in 1 are common, once there are enough the batch evaluation
+            # filters them out before they reach the solver
+            immediate = len(levels[1]) < per_level
+            for key, mover, opponent in sample_positions(SAMPLE, rows, cols, connect, seed, immediate):
+                if key not in seen:
+                    seen.add(key)
+                    tasks.append((rows, cols, connect, mover, opponent, max_moves))
+            for task, result in zip(tasks, pool.map(solve, tasks, chunksize=32)):
+                if result is not None and len(levels[result[0]]) < per_level:
+                    levels[result[0]].append((task[3], task[4], result[1]))
+            print(
+                f'{len(seen)} positions solved, '
+                + ', '.join(f'{len(puzzles)} in {moves}' for moves, puzzles in levels.items())
+                + f', {time.perf_counter() - start:.0f}s'
+            )
+
+    starts = [0]
+    for moves in range(1, max_moves + 1):
+        starts.append(starts[-1] + len(levels[moves]))
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, rows, cols, connect, max_moves))
+        f.write(index_struct(max_moves).pack(*starts))
+        for moves in range(1, max_moves + 1):
+            for record in levels[moves]:
+                f.write(RECORD.pack(*record))
+    print(f'wrote {starts[-1]} puzzles to {path} in {time.perf_counter() - start:.0f}s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate the Connect 4 puzzles')
+    parser.add_argument('--max-moves', type=int, default=MAX_MOVES, help='longest forced win to look for')
+    parser.add_argument('--per-level', type=int, default=PER_LEVEL, help='puzzles kept per number of moves')
+    parser.add_argument('--workers', type=int, default=None, help='solver processes, one per CPU by default')
+    parser.add_argument('--out', default=PUZZLE_PATH)
+    args = parser.parse_args()
+    generate(args.out, args.max_moves, args.per_level, workers=args.workers)
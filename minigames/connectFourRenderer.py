@@ -0,0 +1,71 @@
+import pygame
+
+import config
+
+
+def piece_radius(square):
+    return square * 9 // 20
+
+
+def piece_color(piece):
+    return config.PURPLE if piece == 1 else config.LIGHT_BLUE
+
+
+class BoardRenderer:
+    # Draws the board as one blit. The empty board with its holes and frame is
+    # rendered once into a static surface; placed pieces go onto a copy of it,
+    # the pieces layer, one at a time as they land. Both are rebuilt when the
+    # palette, the board size or the square size changes, and the pieces layer
+    # is reset when a new game (a new bitboard) starts
+    def __init__(self):
+        self.key = None
+        self.static = None
+        self.layer = None
+        self.bitboard = None
+        self.drawn = 0  # moves of bitboard already on the layer
+        self.filled = []
+
+    # The layer starts half a square left of the first column (where the bar
+    # below the board starts) and one square below the board's top edge (the
+    # row of the active piece is not part of it)
+    def build(self, rows, cols, square):
+        mx = square // 2
+        surf = pygame.Surface((cols * square + square, rows * square + square // 2)).convert()
+        surf.fill(config.BLACK)
+        radius = piece_radius(square)
+        for c in range(cols):
+            for r in range(rows):
+                center = (mx + c * square + square // 2, r * square + square // 2)
+                pygame.draw.circle(surf, config.WHITE, center, radius + 3)
+                pygame.draw.circle(surf, config.BLACK, center, radius)
+        pygame.draw.rect(surf, config.WHITE, pygame.Rect(mx - square // 4, 0, square * cols + square // 2, square * rows), width=3)
+        pygame.draw.rect(surf, config.WHITE, pygame.Rect(0, square * rows, square * cols + square, square // 2), width=3)
+        return surf
+
+    def reset_layer(self, bitboard):
+        self.layer = self.static.copy()
+        self.bitboard = bitboard
+        self.drawn = 0
+        self.filled = [0] * bitboard.cols
+
+    def update(self, bitboard, square):
+        key = (config.palette_version, bitboard.rows, bitboard.cols, square)
+        if key != self.key:
+            self.key = key
+            self.static = self.build(bitboard.rows, bitboard.cols, square)
+            self.reset_layer(bitboard)
+        elif bitboard is not self.bitboard or len(bitboard.moves) < self.drawn:
+            self.reset_layer(bitboard)
+        # Draw the pieces that landed since the last frame
+        mx = square // 2
+        radius = piece_radius(square)
+        for col, player in bitboard.moves[self.drawn:]:
+            row = bitboard.rows - 1 - self.filled[col]
+            self.filled[col] += 1
+            center = (mx + col * square + square // 2, row * square + square // 2)
+            pygame.draw.circle(self.layer, piece_color(player), center, radius)
+        self.drawn = len(bitboard.moves)
+
+    def draw(self, screen, bitboard, square, offset_x, offset_y):
+        self.update(bitboard, square)
+        screen.blit(self.layer, (offset_x - square // 2, offset_y + square))
@@ -0,0 +1,85 @@
+import queue
+import threading
+
+import pygame
+
+# Posted with col and token attributes when the computer has chosen a move
+AI_MOVE = pygame.event.custom_type()
+# A ponder search may use this many times the engine's own time limit
+PONDER_FACTOR = 2
+
+
+class AIWorker:
+    # Runs engine searches on a background thread so the game loop keeps its
+    # frame rate while the computer thinks. think() posts an AI_MOVE event when
+    # the move is ready. ponder() searches the position after the human's
+    # expected reply during their turn, so the transposition table is already
+    # filled when the real search starts; it stops after PONDER_FACTOR times
+    # the engine's time limit so a long think by the human leaves the CPU idle.
+    # Every think() or cancel() bumps token; queued requests and posted moves
+    # with an older token are stale and get dropped
+    def __init__(self):
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()
+        self.token = 0
+        self.engine = None  # engine of the running search
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def think(self, engine, bitboard, player):
+        # Returns the token the AI_MOVE event will carry
+        self.cancel()
+        self.requests.put((self.token, 'think', engine, bitboard.copy(), player))
+        return self.token
+
+    def ponder(self, engine, bitboard, player):
+        # player is the computer, the human is about to move on bitboard
+        self.requests.put((self.token, 'ponder', engine, bitboard.copy(), player))
+
+    def cancel(self):
+        with self.lock:
+            self.token += 1
+            if self.engine is not None:
+                self.engine.stop_event.set()
+
+    def close(self):
+        # Stop the running search and wait for the thread, after which the
+        # engines can be closed without a search still using them
+        self.cancel()
+        self.requests.put(None)
+        self.thread.join()
+
+    def run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            token, kind, engine, bitboard, player = request
+            with self.lock:
+                if token != self.token:
+                    continue
+                engine.stop_event.clear()
+                self.engine = engine
+            try:
+                if kind == 'think':
+                    col = engine.best_move(bitboard, player)
+                    pygame.event.post(pygame.event.Event(AI_MOVE, col=col, token=token))
+                else:
+                    self.search_expected_reply(engine, bitboard, player)
+            finally:
+                with self.lock:
+                    self.engine = None
+
+    def search_expected_reply(self, engine, bitboard, player):
+        human = 3 - player
+        reply = engine.expected_reply(bitboard, human)
+        if reply is None:
+            # no prediction from the last search, assume the most central move
+            legal = [c for c in sorted(range(bitboard.cols), key=lambda c: abs(2 * c - (bitboard.cols - 1))) if bitboard.can_play(c)]
+            if not legal:
+                return
+            reply = legal[0]
+        bitboard.play(reply, human)
+        if bitboard.has_won(human) or bitboard.is_full():
+            return
+        engine.best_move(bitboard, player, time_limit=PONDER_FACTOR * engine.time_limit)
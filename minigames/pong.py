@@ -1,31 +1,49 @@
 import pygame
-import sys
 import random
 
 import config
+import scenes
+import textCache
 import screens
+from timestep import FixedTimestep
+from dirtyRects import DirtyRects
 
-PLAYER_SPEED = 10
+PLAYER_SPEED = 600  # pixels per second
 PLAYER_WIDTH = 10
 PLAYER_HEIGHT = 100
+SPEED_INCREMENT = 30
+MAX_IMPACTS = 8  # wall/paddle bounces resolved per tick
+
+dirty_rects = DirtyRects()
 
 
 class Player:
     def __init__(self, color, pos):
         self.color = color
         self.pos = pos
+        self.prev_pos = pygame.Vector2(pos)
         self.speed = PLAYER_SPEED
         self.dir = 0  # -1 up, 1 down, 0 still
         self.wins = 0
 
     def reset(self, x, y):
         self.pos.update(x, y)
+        self.prev_pos.update(x, y)
         self.dir = 0
 
+    def steer(self, up, down):
+        if up:
+            self.dir = -1
+        elif down:
+            self.dir = 1
+        else:
+            self.dir = 0
+
 
 class Ball:
     def __init__(self):
         self.pos = pygame.Vector2(config.WIDTH / 2, config.HEIGHT / 2)
+        self.prev_pos = pygame.Vector2(self.pos)
         self.radius = 10
         self.base_speed = 600
         # Start velocity: horizontal direction random left or right, vertical random small angle
@@ -33,27 +51,62 @@ class Ball:
         vert_dir = random.uniform(-0.5, 0.5)
         self.vel = pygame.Vector2(hor_dir, vert_dir).normalize() * self.base_speed
 
-    def update(self, dt):
-        self.pos += self.vel * dt
-        # Walls top and bottom
-        if self.pos.y - self.radius <= 0:
-            self.pos.y = self.radius
-            self.vel.y *= -1
-        elif self.pos.y + self.radius >= config.HEIGHT:
-            self.pos.y = config.HEIGHT - self.radius
-            self.vel.y *= -1
+    def update(self, dt, paddles=()):
+        # Continuous collision: the ball jumps straight to the earliest wall or paddle
+        # impact within the tick and bounces there, so no speed can tunnel through
+        remaining = dt
+        for _ in range(MAX_IMPACTS):
+            impact = self.first_impact(remaining, paddles)
+            if impact is None:
+                break
+            t, paddle = impact
+            self.pos += self.vel * t
+            remaining -= t
+            if paddle is None:
+                self.vel.y *= -1
+            else:
+                bounce_off_paddle(self, paddle)
+        self.pos += self.vel * remaining
         # Left/right goal
         if self.pos.x - self.radius <= 0:
             self.on_goal('right')
         elif self.pos.x + self.radius >= config.WIDTH:
             self.on_goal('left')
 
+    def first_impact(self, max_t, paddles):
+        # Earliest (time, paddle) impact within max_t; paddle is None for a wall
+        best = None
+        # Walls top and bottom
+        if self.vel.y < 0:
+            best = (max(0.0, (self.radius - self.pos.y) / self.vel.y), None)
+        elif self.vel.y > 0:
+            best = (max(0.0, (config.HEIGHT - self.radius - self.pos.y) / self.vel.y), None)
+        # Paddle faces, widened by the ball radius
+        for paddle in paddles:
+            if paddle_faces_right(paddle):
+                face_x = paddle.pos.x + PLAYER_WIDTH + self.radius
+                if self.vel.x >= 0 or self.pos.x < face_x:
+                    continue
+            else:
+                face_x = paddle.pos.x - self.radius
+                if self.vel.x <= 0 or self.pos.x > face_x:
+                    continue
+            t = (face_x - self.pos.x) / self.vel.x
+            y = self.pos.y + self.vel.y * t
+            if paddle.pos.y - self.radius <= y <= paddle.pos.y + PLAYER_HEIGHT + self.radius:
+                if best is None or t < best[0]:
+                    best = (t, paddle)
+        if best is None or best[0] > max_t:
+            return None
+        return best
+
     def on_goal(self, side):
         if side == 'right':
             self.opponent.wins += 1
         else:
             self.scorer.wins += 1
         self.pos = pygame.Vector2(config.WIDTH / 2, config.HEIGHT / 2)
+        self.prev_pos = pygame.Vector2(self.pos)
         self.base_speed = 600
         # random angle in opponents direction
         hor_dir = -1 if side == 'right' else 1
@@ -61,13 +114,13 @@ class Ball:
         self.vel = pygame.Vector2(hor_dir, vert_dir).normalize() * self.base_speed
         self.game_state.game_over = True
 
-    def draw(self, screen):
-        pygame.draw.circle(screen, config.WHITE, (int(self.pos.x), int(self.pos.y)), self.radius)
+    def draw(self, screen, alpha=1.0):
+        pos = self.prev_pos.lerp(self.pos, alpha)
+        return pygame.draw.circle(screen, config.WHITE, (int(pos.x), int(pos.y)), self.radius)
 
 
 class GameState:
     def __init__(self):
-        self.start_ticks = pygame.time.get_ticks()
         self.countdown_time = 3.0
         self.game_over = False
         self.show_settings = False
@@ -89,11 +142,9 @@ def handle_events(
     for event in pygame.event.get():
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_q and (event.mod & pygame.KMOD_META):
-                pygame.quit()
-                sys.exit()
+                scenes.manager.quit()
         if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
+            scenes.manager.quit()
 
         if game_state.show_quit_confirmation:
             quit_screen.handle(game_state, event)
@@ -135,77 +186,77 @@ def restart_game(player1, player2, game_state):
     player2.reset(config.WIDTH - 20 - PLAYER_WIDTH, config.HEIGHT // 2 - PLAYER_HEIGHT // 2)
     game_state.game_over = False
     game_state.countdown_time = 3.0
-    game_state.start_ticks = pygame.time.get_ticks()
+
+
+def paddle_faces_right(player):
+    return player.pos.x + PLAYER_WIDTH / 2 < config.WIDTH / 2
+
+
+def bounce_off_paddle(ball, player):
+    # Reflect ball horizontally, add some vertical velocity based on hit position
+    if paddle_faces_right(player):
+        ball.pos.x = player.pos.x + PLAYER_WIDTH + ball.radius
+    else:
+        ball.pos.x = player.pos.x - ball.radius
+    ball.vel.x *= -1
+    offset = (ball.pos.y - (player.pos.y + PLAYER_HEIGHT / 2)) / (PLAYER_HEIGHT / 2)
+    ball.vel.y = offset * ball.base_speed * 0.75
+    ball.base_speed += SPEED_INCREMENT
+    ball.vel = ball.vel.normalize() * ball.base_speed
+
+
+def read_actions(keys):
+    # (up, down) for each paddle
+    return (
+        (keys[pygame.K_w], keys[pygame.K_s]),
+        (keys[pygame.K_UP], keys[pygame.K_DOWN])
+    )
 
 
 def update_game(player1, player2, game_state, dt, ball):
+    step(player1, player2, game_state, read_actions(pygame.key.get_pressed()), dt, ball)
+
+
+def step(player1, player2, game_state, actions, dt, ball):
+    # Advances the match by dt seconds using explicit actions (see read_actions).
+    # No display, event or clock access, so it can run headless and faster than real time
     if not game_state.game_started:
-        return
+        return game_state
     if game_state.paused or game_state.game_over:
-        return
-
-    keys = pygame.key.get_pressed()
+        return game_state
 
     if game_state.countdown_time > 0:
         game_state.countdown_time -= dt
         if game_state.countdown_time < 0:
             game_state.countdown_time = 0
-        return
+        return game_state
 
-    if game_state.game_over:
-        restart_game(player1, player2, game_state)
-
-    # Paddle 1 movement (W/S)
-    if keys[pygame.K_w]:
-        player1.dir = -1
-    elif keys[pygame.K_s]:
-        player1.dir = 1
-    else:
-        player1.dir = 0
-
-    # Paddle 2 movement (UP/DOWN)
-    if keys[pygame.K_UP]:
-        player2.dir = -1
-    elif keys[pygame.K_DOWN]:
-        player2.dir = 1
-    else:
-        player2.dir = 0
+    player1.steer(*actions[0])
+    player2.steer(*actions[1])
 
     # Update paddle positions
-    player1.pos.y += player1.dir * player1.speed
-    player2.pos.y += player2.dir * player2.speed
+    player1.pos.y += player1.dir * player1.speed * dt
+    player2.pos.y += player2.dir * player2.speed * dt
 
     # Clamp paddles inside screen
     player1.pos.y = max(0, min(config.HEIGHT - PLAYER_HEIGHT, player1.pos.y))
     player2.pos.y = max(0, min(config.HEIGHT - PLAYER_HEIGHT, player2.pos.y))
 
-    # Update ball
-    ball.update(dt)
+    # Update ball, bouncing off walls and paddle faces along the way
+    ball.update(dt, (player1, player2))
 
-    # Check ball collision with paddles
+    # A paddle moving onto the ball from above or below is not a face impact
     paddle1_rect = pygame.Rect(player1.pos.x, player1.pos.y, PLAYER_WIDTH, PLAYER_HEIGHT)
     paddle2_rect = pygame.Rect(player2.pos.x, player2.pos.y, PLAYER_WIDTH, PLAYER_HEIGHT)
 
     ball_rect = pygame.Rect(ball.pos.x - ball.radius, ball.pos.y - ball.radius, ball.radius * 2, ball.radius * 2)
 
-    SPEED_INCREMENT = 30
+    if ball.vel.x < 0 and ball_rect.colliderect(paddle1_rect):
+        bounce_off_paddle(ball, player1)
+    elif ball.vel.x > 0 and ball_rect.colliderect(paddle2_rect):
+        bounce_off_paddle(ball, player2)
 
-    if ball_rect.colliderect(paddle1_rect):
-        # Reflect ball horizontally, add some vertical velocity based on hit position
-        ball.pos.x = paddle1_rect.right + ball.radius
-        ball.vel.x *= -1
-        offset = (ball.pos.y - paddle1_rect.centery) / (PLAYER_HEIGHT / 2)
-        ball.vel.y = offset * ball.base_speed * 0.75
-        ball.base_speed += SPEED_INCREMENT
-        ball.vel = ball.vel.normalize() * ball.base_speed
-
-    elif ball_rect.colliderect(paddle2_rect):
-        ball.pos.x = paddle2_rect.left - ball.radius
-        ball.vel.x *= -1
-        offset = (ball.pos.y - paddle2_rect.centery) / (PLAYER_HEIGHT / 2)
-        ball.vel.y = offset * ball.base_speed * 0.75
-        ball.base_speed += SPEED_INCREMENT
-        ball.vel = ball.vel.normalize() * ball.base_speed
+    return game_state
 
 
 def draw_game(
@@ -219,24 +270,21 @@ def draw_game(
         quit_screen,
         game_over_screen,
         go_to_menu_screen,
-        ball
+        ball,
+        alpha=1.0
 ):
-    screen.fill(config.BLACK)
-
-    draw_score(screen, player1, player2)
-    draw_players(screen, player1, player2)
-    pygame.draw.rect(screen, config.WHITE, config.get_border(), width=config.border_width)
-    pygame.draw.rect(screen, config.get_rect_below_border_color(), config.get_rect_below_border())
+    overlay = (
+        game_state.go_to_menu or game_state.show_settings or game_state.show_quit_confirmation
+        or not game_state.game_started or game_state.paused or game_state.game_over
+    )
+    # While only the paddles and the ball move, redraw just those
+    if not overlay and dirty_rects.begin(screen, (player1.wins, player2.wins), lambda surf: draw_background(surf, player1, player2)):
+        draw_moving(screen, player1, player2, game_state, ball, alpha)
+        return
+    dirty_rects.full_frame()
 
-    ball.draw(screen)
-
-    if game_state.game_started:
-        # countdown
-        if game_state.countdown_time > 0:
-            countdown_font = pygame.font.SysFont(None, 150)
-            countdown_text = countdown_font.render(str(int(game_state.countdown_time) + 1), True, config.WHITE)
-            countdown_rect = countdown_text.get_rect(center=(config.WIDTH // 2, config.HEIGHT // 4))
-            screen.blit(countdown_text, countdown_rect)
+    draw_background(screen, player1, player2)
+    draw_moving(screen, player1, player2, game_state, ball, alpha)
 
     if game_state.go_to_menu:
         go_to_menu_screen.draw_screen(config.screen)
@@ -260,59 +308,116 @@ def draw_game(
                 game_over_screen.draw_screen(config.screen)
 
 
-def draw_players(screen, player1, player2):
-    # draw paddles
-    pygame.draw.rect(screen, player1.color, (int(player1.pos.x), int(player1.pos.y), PLAYER_WIDTH, PLAYER_HEIGHT))
-    pygame.draw.rect(screen, player2.color, (int(player2.pos.x), int(player2.pos.y), PLAYER_WIDTH, PLAYER_HEIGHT))
+def draw_background(screen, player1, player2):
+    screen.fill(config.BLACK)
+    draw_score(screen, player1, player2)
+    pygame.draw.rect(screen, config.WHITE, config.get_border(), width=config.border_width)
+    pygame.draw.rect(screen, config.get_rect_below_border_color(), config.get_rect_below_border())
+
+
+def draw_moving(screen, player1, player2, game_state, ball, alpha=1.0):
+    # Paddles, ball and countdown; their rects go to dirty_rects
+    for rect in draw_players(screen, player1, player2, alpha):
+        draw_border(screen, rect)
+        dirty_rects.add(rect)
+    dirty_rects.add(ball.draw(screen, alpha))
+
+    if game_state.game_started:
+        # countdown
+        if game_state.countdown_time > 0:
+            countdown_text = textCache.render(config.fonts['countdown'], str(int(game_state.countdown_time) + 1), config.WHITE)
+            countdown_rect = countdown_text.get_rect(center=(config.WIDTH // 2, config.HEIGHT // 4))
+            dirty_rects.add(screen.blit(countdown_text, countdown_rect))
+
+
+def draw_border(screen, area):
+    # The border lies on top of the paddles; redraw the part of it inside area.
+    # Its four strips are filled one by one, a clipped outline rect would be
+    # filled inside as well
+    border, width = config.get_border(), config.border_width
+    for strip in (
+        pygame.Rect(border.left, border.top, border.width, width),
+        pygame.Rect(border.left, border.bottom - width, border.width, width),
+        pygame.Rect(border.left, border.top, width, border.height),
+        pygame.Rect(border.right - width, border.top, width, border.height),
+    ):
+        part = strip.clip(area)
+        if part:
+            screen.fill(config.WHITE, part)
+
+
+def draw_players(screen, player1, player2, alpha=1.0):
+    # draw paddles, interpolated between the last two ticks; returns their rects
+    rects = []
+    for player in (player1, player2):
+        pos = player.prev_pos.lerp(player.pos, alpha)
+        rects.append(pygame.draw.rect(screen, player.color, (int(pos.x), int(pos.y), PLAYER_WIDTH, PLAYER_HEIGHT)))
+    return rects
 
 
 def draw_score(screen, player1, player2):
-    text = config.fonts['score'].render(str(player1.wins), True, config.WHITE)
+    text = textCache.render(config.fonts['score'], str(player1.wins), config.WHITE)
     rect = text.get_rect(center=(config.WIDTH // 4, 50))
     screen.blit(text, rect)
 
-    text = config.fonts['score'].render(str(player2.wins), True, config.WHITE)
+    text = textCache.render(config.fonts['score'], str(player2.wins), config.WHITE)
     rect = text.get_rect(center=((config.WIDTH // 4) * 3, 50))
     screen.blit(text, rect)
 
 
-def main():
+class PongScene(scenes.Scene):
+    caption = "Pong"
 
-    pygame.init()
+    def __init__(self):
+        self.quit_screen = screens.QuitScreen()
+        self.settings_screen = screens.SettingsScreen()
+        self.pause_screen = screens.PauseScreen()
+        self.start_screen = screens.StartScreen()
+        self.game_over_screen = screens.GameOverScreen(lambda: restart_game(self.player1, self.player2, self.game_state))
+        self.go_to_menu_screen = screens.GoToMenuScreen()
+        self.menus = (
+            self.quit_screen, self.settings_screen, self.pause_screen,
+            self.start_screen, self.game_over_screen, self.go_to_menu_screen,
+        )
 
-    pygame.display.set_caption("Pong")
-    config.WIDTH, config.HEIGHT = config.screen.get_size()
+    def enter(self):
+        # A fresh match every time the game is opened
+        super().enter()
+        self.player1 = Player(config.PURPLE, pygame.Vector2(20, config.HEIGHT // 2 - PLAYER_HEIGHT // 2))
+        self.player2 = Player(config.LIGHT_BLUE, pygame.Vector2(config.WIDTH - 20 - PLAYER_WIDTH, config.HEIGHT // 2 - PLAYER_HEIGHT // 2))
 
-    quit_screen = screens.QuitScreen()
-    settings_screen = screens.SettingsScreen()
-    pause_screen = screens.PauseScreen()
-    start_screen = screens.StartScreen()
-    game_over_screen = screens.GameOverScreen(lambda: restart_game(player1, player2, game_state))
-    go_to_menu_screen = screens.GoToMenuScreen()
+        self.game_state = GameState()
 
-    player1 = Player(config.PURPLE, pygame.Vector2(20, config.HEIGHT // 2 - PLAYER_HEIGHT // 2))
-    player2 = Player(config.LIGHT_BLUE, pygame.Vector2(config.WIDTH - 20 - PLAYER_WIDTH, config.HEIGHT // 2 - PLAYER_HEIGHT // 2))
+        self.ball = Ball()
+        self.ball.scorer = self.player1
+        self.ball.opponent = self.player2
+        self.ball.game_state = self.game_state
 
-    game_state = GameState()
+        self.timestep = FixedTimestep()
+        dirty_rects.full_frame()
 
-    ball = Ball()
-    ball.scorer = player1
-    ball.opponent = player2
-    ball.game_state = game_state
+    def tick(self, dt):
+        self.player1.prev_pos.update(self.player1.pos)
+        self.player2.prev_pos.update(self.player2.pos)
+        self.ball.prev_pos.update(self.ball.pos)
+        update_game(self.player1, self.player2, self.game_state, dt, self.ball)
 
-    clock = pygame.time.Clock()
+    def animating(self):
+        # The match and its countdown run until it is paused or over
+        game_state = self.game_state
+        return game_state.game_started and not (game_state.paused or game_state.game_over)
 
-    while True:
-        dt = clock.tick(60) / 1000
+    def frame(self, frame_time):
+        player1, player2, game_state = self.player1, self.player2, self.game_state
 
-        handle_events(game_state, quit_screen, settings_screen, pause_screen, start_screen, game_over_screen, go_to_menu_screen)
+        handle_events(game_state, self.quit_screen, self.settings_screen, self.pause_screen, self.start_screen, self.game_over_screen, self.go_to_menu_screen)
 
         if game_state.paused or not game_state.game_started or game_state.game_over:
             pygame.mouse.set_visible(True)
         else:
             pygame.mouse.set_visible(False)
 
-        update_game(player1, player2, game_state, dt, ball)
+        alpha = self.timestep.advance(frame_time, self.tick)
 
         player1.color = config.PURPLE
         player2.color = config.LIGHT_BLUE
@@ -322,17 +427,22 @@ def main():
             player1,
             player2,
             game_state,
-            pause_screen,
-            start_screen,
-            settings_screen,
-            quit_screen,
-            game_over_screen,
-            go_to_menu_screen,
-            ball
+            self.pause_screen,
+            self.start_screen,
+            self.settings_screen,
+            self.quit_screen,
+            self.game_over_screen,
+            self.go_to_menu_screen,
+            self.ball,
+            alpha
         )
 
-        pygame.display.flip()
+        dirty_rects.present()
+
+
+def main():
+    scenes.manager.run(PongScene)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,81 @@
+import math
+import numpy as np
+
+import config
+
+
+def capacity_for(length, speed):
+    # Points needed to hold length pixels of path for a head moving at speed
+    # pixels per second; sliding diagonally along a border covers only ~0.7 of it
+    return int(length * config.TICK_RATE / (speed * 0.7)) + 2
+
+
+class TrailBuffer:
+    # Fixed-capacity ring buffer of x/y points. Every point is written twice,
+    # at slot and slot + capacity, so the live points are always one
+    # contiguous slice of the backing array and views never copy.
+    # Point number k (counting every append since the last clear) lives in
+    # slot k % capacity.
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.zeros((2 * capacity, 2))
+        self.arc = np.zeros(capacity)  # path length travelled up to each point
+        self.total = 0.0
+        self.length = 0
+        self.count = 0  # total points appended since the last clear
+
+    def __len__(self):
+        return self.length
+
+    def start(self):
+        return (self.count - self.length) % self.capacity
+
+    def append(self, x, y):
+        if self.length == self.capacity:
+            self.popleft()
+        slot = self.count % self.capacity
+        data = self.data
+        if self.length:
+            last = (self.count - 1) % self.capacity
+            self.total += math.hypot(x - data[last, 0], y - data[last, 1])
+        self.arc[slot] = self.total
+        data[slot, 0] = data[slot + self.capacity, 0] = x
+        data[slot, 1] = data[slot + self.capacity, 1] = y
+        self.length += 1
+        self.count += 1
+
+    def popleft(self):
+        if self.length:
+            self.length -= 1
+
+    def oldest(self):
+        slot = self.start()
+        return self.data[slot, 0], self.data[slot, 1]
+
+    def newest(self):
+        slot = (self.count - 1) % self.capacity
+        return self.data[slot, 0], self.data[slot, 1]
+
+    def view(self, skip_newest=0):
+        # Oldest-to-newest (n, 2) view without the newest skip_newest points
+        start = self.start()
+        return self.data[start:start + max(0, self.length - skip_newest)]
+
+    def points(self, indices):
+        # Coordinates of the given point numbers as an (n, 2) array
+        return self.data[np.asarray(indices) % self.capacity]
+
+    def path_length(self):
+        # Path length from the oldest to the newest point
+        if not self.length:
+            return 0.0
+        return self.total - self.arc[self.start()]
+
+    def arcs(self, indices):
+        # Path length travelled up to the given point numbers
+        return self.arc[np.asarray(indices) % self.capacity]
+
+    def clear(self):
+        self.length = 0
+        self.count = 0
+        self.total = 0.0
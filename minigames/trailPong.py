@@ -1,35 +1,64 @@
 import pygame
-import sys
 import random
 
 import config
+import scenes
+import textCache
 import screens
+from timestep import FixedTimestep
 import math
+import numpy as np
+from minigames.trailBuffer import TrailBuffer, capacity_for
+from minigames.trailSprites import TrailSprites
 
-PLAYER_SPEED = 7
+PLAYER_SPEED = 420  # pixels per second
 PLAYER_SIZE = 30
-TRAIL_LENGTH = 30
+TRAIL_LENGTH = 210  # pixels of path
 GROWTH_PER_SECOND = 10
 
+trail_sprites = TrailSprites(PLAYER_SIZE // 10)
+
 
 class Player:
     def __init__(self, color, pos):
         self.color = color
         self.pos = pos
+        self.prev_pos = pygame.Vector2(pos)
         self.speed = PLAYER_SPEED
-        self.trail = []
+        self.trail = TrailBuffer(capacity_for(TRAIL_LENGTH, self.speed))
         self.dir = pygame.Vector2(0, -1)
         self.wins = 0
         self.trail_length = TRAIL_LENGTH
 
     def reset(self, x, y):
         self.pos.update(x, y)
+        self.prev_pos.update(x, y)
         self.dir = pygame.Vector2(0, -1)
         self.trail.clear()
 
+    def steer(self, up, down, left, right):
+        move_dir = pygame.Vector2(self.dir)
+        # edit y-component
+        if up:
+            move_dir.y = -1
+        elif down:
+            move_dir.y = 1
+        else:
+            move_dir.y = 0
+        # edit x-component
+        if left:
+            move_dir.x = -1
+        elif right:
+            move_dir.x = 1
+        else:
+            move_dir.x = 0
+        if move_dir.length() > 0:
+            self.dir = move_dir.normalize()
+
 class Ball:
     def __init__(self):
         self.pos = pygame.Vector2(config.WIDTH/2, config.HEIGHT/2)
+        self.prev_pos = pygame.Vector2(self.pos)
         self.radius = 10
         self.base_speed = 350
         angle = random.uniform(0, 2 * math.pi)
@@ -56,6 +85,7 @@ class Ball:
         else:
             self.scorer.wins += 1
         self.pos = pygame.Vector2(config.WIDTH/2, config.HEIGHT/2)
+        self.prev_pos = pygame.Vector2(self.pos)
         vert_dir = random.uniform(-1, 1)
         if side == 'right':
             self.vel = pygame.Vector2(-1, vert_dir).normalize() * self.base_speed
@@ -63,12 +93,13 @@ class Ball:
             self.vel = pygame.Vector2(1, vert_dir).normalize() * self.base_speed
         self.game_state.game_over = True
 
-    def draw(self, screen):
-        pygame.draw.circle(screen, config.WHITE, (int(self.pos.x), int(self.pos.y)), self.radius)
+    def draw(self, screen, alpha=1.0):
+        pos = self.prev_pos.lerp(self.pos, alpha)
+        pygame.draw.circle(screen, config.WHITE, (int(pos.x), int(pos.y)), self.radius)
 
 class GameState:
     def __init__(self):
-        self.start_ticks = pygame.time.get_ticks()
+        self.elapsed = 0.0  # seconds of play, the clock for ball collision cooldowns
         self.countdown_time = 3.0
         self.game_over = False
         self.show_settings = False
@@ -89,11 +120,9 @@ def handle_events(
     for event in pygame.event.get():
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_q and (event.mod & pygame.KMOD_META):
-                pygame.quit()
-                sys.exit()
+                scenes.manager.quit()
         if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
+            scenes.manager.quit()
 
         if game_state.show_quit_confirmation:
             quit_screen.handle(game_state, event)
@@ -133,65 +162,68 @@ def restart_game(player1, player2, game_state):
     player2.reset(3 * config.WIDTH // 4, config.HEIGHT // 2)
     game_state.game_over = False
     game_state.countdown_time = 3.0
-    game_state.start_ticks = pygame.time.get_ticks()
+
+def find_trail_contact(trails, center, radius):
+    # Nearest trail point closer than radius to center, tested in one batch over
+    # every trail whose bounding box reaches the circle.
+    # Returns (contact point, normal pointing towards center, distance) or None
+    candidates = []
+    for trail in trails:
+        points = trail.view()
+        if not len(points):
+            continue
+        low = points.min(axis=0)
+        high = points.max(axis=0)
+        if (center.x + radius < low[0] or center.x - radius > high[0]
+                or center.y + radius < low[1] or center.y - radius > high[1]):
+            continue
+        candidates.append(points)
+    if not candidates:
+        return None
+
+    points = candidates[0] if len(candidates) == 1 else np.concatenate(candidates)
+    offsets = np.array((center.x, center.y)) - points
+    dist_sq = np.einsum('ij,ij->i', offsets, offsets)
+    nearest = int(dist_sq.argmin())
+    if dist_sq[nearest] >= radius * radius:
+        return None
+
+    dist = math.sqrt(dist_sq[nearest])
+    contact = pygame.Vector2(points[nearest].tolist())
+    normal = pygame.Vector2(offsets[nearest].tolist()) / dist if dist != 0 else pygame.Vector2(1, 0)
+    return contact, normal, dist
+
+def read_actions(keys):
+    # (up, down, left, right) for each player
+    return (
+        (keys[pygame.K_w], keys[pygame.K_s], keys[pygame.K_a], keys[pygame.K_d]),
+        (keys[pygame.K_UP], keys[pygame.K_DOWN], keys[pygame.K_LEFT], keys[pygame.K_RIGHT])
+    )
 
 def update_game(player1, player2, game_state, dt, ball):
+    step(player1, player2, game_state, read_actions(pygame.key.get_pressed()), dt, ball)
+
+def step(player1, player2, game_state, actions, dt, ball):
+    # Advances the match by dt seconds using explicit actions (see read_actions).
+    # No display, event or clock access, so it can run headless and faster than real time
     if not game_state.game_started:
-        return
+        return game_state
     if game_state.paused or game_state.game_over:
-        return
+        return game_state
 
-    keys = pygame.key.get_pressed()
+    game_state.elapsed += dt
 
     if game_state.countdown_time > 0:
         game_state.countdown_time -= dt
         if game_state.countdown_time < 0:
             game_state.countdown_time = 0
-        return
-
-    if game_state.game_over:
-        restart_game(player1, player2, game_state)
-
-    move_dir1 = pygame.Vector2(player1.dir)
-    # edit y-component
-    if keys[pygame.K_w]:
-        move_dir1.y = -1
-    elif keys[pygame.K_s]:
-        move_dir1.y = 1
-    else:
-        move_dir1.y = 0
-    # edit x-component
-    if keys[pygame.K_a]:
-        move_dir1.x = -1
-    elif keys[pygame.K_d]:
-        move_dir1.x = 1
-    else:
-        move_dir1.x = 0
-    if move_dir1.length() > 0:
-        move_dir1 = move_dir1.normalize()
-        player1.dir = move_dir1
-
-    move_dir2 = pygame.Vector2(player2.dir)
-    # edit y-component
-    if keys[pygame.K_UP]:
-        move_dir2.y = -1
-    elif keys[pygame.K_DOWN]:
-        move_dir2.y = 1
-    else:
-        move_dir2.y = 0
-    # edit x-component
-    if keys[pygame.K_LEFT]:
-        move_dir2.x = -1
-    elif keys[pygame.K_RIGHT]:
-        move_dir2.x = 1
-    else:
-        move_dir2.x = 0
-    if move_dir2.length() > 0:
-        move_dir2 = move_dir2.normalize()
-        player2.dir = move_dir2
-
-    player1.pos += player1.dir * player1.speed
-    player2.pos += player2.dir * player2.speed
+        return game_state
+
+    player1.steer(*actions[0])
+    player2.steer(*actions[1])
+
+    player1.pos += player1.dir * player1.speed * dt
+    player2.pos += player2.dir * player2.speed * dt
 
     # check screen borders
     player1.pos.x = max(0, min(config.WIDTH - PLAYER_SIZE, player1.pos.x))
@@ -200,55 +232,33 @@ def update_game(player1, player2, game_state, dt, ball):
     player2.pos.y = max(0, min(config.HEIGHT - PLAYER_SIZE, player2.pos.y))
 
     # update trails
-    player1.trail.append(player1.pos + pygame.Vector2(PLAYER_SIZE / 2, PLAYER_SIZE / 2))
-    player2.trail.append(player2.pos + pygame.Vector2(PLAYER_SIZE / 2, PLAYER_SIZE / 2))
+    player1.trail.append(player1.pos.x + PLAYER_SIZE / 2, player1.pos.y + PLAYER_SIZE / 2)
+    player2.trail.append(player2.pos.x + PLAYER_SIZE / 2, player2.pos.y + PLAYER_SIZE / 2)
 
-    if len(player1.trail) > player1.trail_length:
-        player1.trail.pop(0)
-    if len(player2.trail) > player2.trail_length:
-        player2.trail.pop(0)
+    while player1.trail.path_length() > player1.trail_length:
+        player1.trail.popleft()
+    while player2.trail.path_length() > player2.trail_length:
+        player2.trail.popleft()
 
     # update ball
     ball.update(dt)
 
     # check ball collision with trails (Einfallswinkel = Ausfallswinkel)
-    now = pygame.time.get_ticks() / 1000.0
+    now = game_state.elapsed
     trail_r = PLAYER_SIZE // 10
 
-    # Player 1 trail collision (with cooldown + depenetration)
-    if now - ball.last_collision_time >= ball.collision_cooldown:
-        seen = []
-        for pos in player1.trail:
-            if not any(pos == s for s in seen):
-                seen.append(pos)
-                to_center = ball.pos - pos
-                dist = to_center.length()
-                if dist < ball.radius + trail_r:
-                    normal = to_center.normalize() if dist != 0 else pygame.Vector2(1, 0)
-                    ball.vel = ball.vel.reflect(normal)
-                    ball.vel = ball.vel.normalize() * ball.base_speed
-                    # Push the ball out of the trail circle to avoid re-colliding next frame
-                    overlap = (ball.radius + trail_r - dist) if dist != 0 else (ball.radius + trail_r)
-                    ball.pos += normal * (overlap + 0.5)
-                    ball.last_collision_time = now
-                    break
-
-    # Player 2 trail collision (with cooldown + depenetration)
     if now - ball.last_collision_time >= ball.collision_cooldown:
-        seen = []
-        for pos in player2.trail:
-            if not any(pos == s for s in seen):
-                seen.append(pos)
-                to_center = ball.pos - pos
-                dist = to_center.length()
-                if dist < ball.radius + trail_r:
-                    normal = to_center.normalize() if dist != 0 else pygame.Vector2(1, 0)
-                    ball.vel = ball.vel.reflect(normal)
-                    ball.vel = ball.vel.normalize() * ball.base_speed
-                    overlap = (ball.radius + trail_r - dist) if dist != 0 else (ball.radius + trail_r)
-                    ball.pos += normal * (overlap + 0.5)
-                    ball.last_collision_time = now
-                    break
+        contact = find_trail_contact((player1.trail, player2.trail), ball.pos, ball.radius + trail_r)
+        if contact is not None:
+            _, normal, dist = contact
+            ball.vel = ball.vel.reflect(normal)
+            ball.vel = ball.vel.normalize() * ball.base_speed
+            # Push the ball out of the trail circle to avoid re-colliding next frame
+            overlap = ball.radius + trail_r - dist
+            ball.pos += normal * (overlap + 0.5)
+            ball.last_collision_time = now
+
+    return game_state
 
 
 def draw_game(
@@ -262,22 +272,22 @@ def draw_game(
         quit_screen,
         game_over_screen,
         go_to_menu_screen,
-        ball
+        ball,
+        alpha=1.0
 ):
     screen.fill(config.BLACK)
 
     draw_score(screen, player1, player2)
-    draw_players(screen, player1, player2)
+    draw_players(screen, player1, player2, alpha)
     pygame.draw.rect(screen, config.WHITE, config.get_border(), width=config.border_width)
     pygame.draw.rect(screen, config.get_rect_below_border_color(), config.get_rect_below_border())
 
-    ball.draw(screen)
+    ball.draw(screen, alpha)
 
     if game_state.game_started:
         # countdown
         if game_state.countdown_time > 0:
-            countdown_font = pygame.font.SysFont(None, 150)
-            countdown_text = countdown_font.render(str(int(game_state.countdown_time) + 1), True, config.WHITE)
+            countdown_text = textCache.render(config.fonts['countdown'], str(int(game_state.countdown_time) + 1), config.WHITE)
             countdown_rect = countdown_text.get_rect(center=(config.WIDTH // 2, config.HEIGHT // 4))
             screen.blit(countdown_text, countdown_rect)
 
@@ -303,75 +313,78 @@ def draw_game(
                 game_over_screen.draw_screen(config.screen)
 
 
-def draw_players(screen, player1, player2):
+def draw_players(screen, player1, player2, alpha=1.0):
     # draw trails
-    trail_length = len(player1.trail)
-    for i, pos in enumerate(player1.trail):
-        alpha = int(50 + 205 * (i / trail_length))
-        color = (*player1.color[:3], alpha)
-        trail_surf = pygame.Surface((PLAYER_SIZE, PLAYER_SIZE), pygame.SRCALPHA)
-        pygame.draw.circle(trail_surf, color, (PLAYER_SIZE // 2, PLAYER_SIZE // 2), PLAYER_SIZE // 10)
-        screen.blit(trail_surf, (int(pos.x - PLAYER_SIZE // 2), int(pos.y - PLAYER_SIZE // 2)))
-
-    trail_length = len(player2.trail)
-    for i, pos in enumerate(player2.trail):
-        alpha = int(50 + 205 * (i / trail_length))
-        color = (*player2.color[:3], alpha)
-        trail_surf = pygame.Surface((PLAYER_SIZE, PLAYER_SIZE), pygame.SRCALPHA)
-        pygame.draw.circle(trail_surf, color, (PLAYER_SIZE // 2, PLAYER_SIZE // 2), PLAYER_SIZE // 10)
-        screen.blit(trail_surf, (int(pos.x - PLAYER_SIZE // 2), int(pos.y - PLAYER_SIZE // 2)))
-
-    # draw player
-    pygame.draw.circle(screen, player1.color, (int(player1.pos.x + PLAYER_SIZE / 2), int(player1.pos.y + PLAYER_SIZE / 2)), PLAYER_SIZE // 3)
-    pygame.draw.circle(screen, player2.color, (int(player2.pos.x + PLAYER_SIZE / 2), int(player2.pos.y + PLAYER_SIZE / 2)), PLAYER_SIZE // 3)
+    trail_sprites.draw(screen, player1.trail, player1.color)
+    trail_sprites.draw(screen, player2.trail, player2.color)
+
+    # draw player, interpolated between the last two ticks
+    for player in (player1, player2):
+        pos = player.prev_pos.lerp(player.pos, alpha)
+        pygame.draw.circle(screen, player.color, (int(pos.x + PLAYER_SIZE / 2), int(pos.y + PLAYER_SIZE / 2)), PLAYER_SIZE // 3)
 
 def draw_score(screen, player1, player2):
-    text = config.fonts['score'].render(str(player1.wins), True, config.WHITE)
+    text = textCache.render(config.fonts['score'], str(player1.wins), config.WHITE)
     rect = text.get_rect(center=(config.WIDTH // 4, 50))
     screen.blit(text, rect)
 
-    text = config.fonts['score'].render(str(player2.wins), True, config.WHITE)
+    text = textCache.render(config.fonts['score'], str(player2.wins), config.WHITE)
     rect = text.get_rect(center=((config.WIDTH // 4) * 3, 50))
     screen.blit(text, rect)
 
 
-def main():
+class TrailPongScene(scenes.Scene):
+    caption = "Trail Pong"
 
-    pygame.init()
+    def __init__(self):
+        self.quit_screen = screens.QuitScreen()
+        self.settings_screen = screens.SettingsScreen()
+        self.pause_screen = screens.PauseScreen()
+        self.start_screen = screens.StartScreen()
+        self.game_over_screen = screens.GameOverScreen(lambda: restart_game(self.player1, self.player2, self.game_state))
+        self.go_to_menu_screen = screens.GoToMenuScreen()
+        self.menus = (
+            self.quit_screen, self.settings_screen, self.pause_screen,
+            self.start_screen, self.game_over_screen, self.go_to_menu_screen,
+        )
 
-    pygame.display.set_caption("Trail Pong")
-    config.WIDTH, config.HEIGHT = config.screen.get_size()
+    def enter(self):
+        # A fresh match every time the game is opened
+        super().enter()
+        self.player1 = Player(config.PURPLE, pygame.Vector2(config.WIDTH // 4 - 15, config.HEIGHT // 2 - 15))
+        self.player2 = Player(config.LIGHT_BLUE, pygame.Vector2(3 * config.WIDTH // 4 - 15, config.HEIGHT // 2 - 15))
 
-    quit_screen = screens.QuitScreen()
-    settings_screen = screens.SettingsScreen()
-    pause_screen = screens.PauseScreen()
-    start_screen = screens.StartScreen()
-    game_over_screen = screens.GameOverScreen(lambda: restart_game(player1, player2, game_state))
-    go_to_menu_screen = screens.GoToMenuScreen()
+        self.game_state = GameState()
 
-    player1 = Player(config.PURPLE, pygame.Vector2(config.WIDTH // 4 - 15, config.HEIGHT // 2 - 15))
-    player2 = Player(config.LIGHT_BLUE, pygame.Vector2(3 * config.WIDTH // 4 - 15, config.HEIGHT // 2 - 15))
+        self.ball = Ball()
+        self.ball.scorer = self.player1
+        self.ball.opponent = self.player2
+        self.ball.game_state = self.game_state
 
-    game_state = GameState()
+        self.timestep = FixedTimestep()
 
-    ball = Ball()
-    ball.scorer = player1
-    ball.opponent = player2
-    ball.game_state = game_state
+    def tick(self, dt):
+        self.player1.prev_pos.update(self.player1.pos)
+        self.player2.prev_pos.update(self.player2.pos)
+        self.ball.prev_pos.update(self.ball.pos)
+        update_game(self.player1, self.player2, self.game_state, dt, self.ball)
 
-    clock = pygame.time.Clock()
+    def animating(self):
+        # The match and its countdown run until it is paused or over
+        game_state = self.game_state
+        return game_state.game_started and not (game_state.paused or game_state.game_over)
 
-    while True:
-        dt = clock.tick(60) / 1000
+    def frame(self, frame_time):
+        player1, player2, game_state = self.player1, self.player2, self.game_state
 
-        handle_events(game_state, quit_screen, settings_screen, pause_screen, start_screen, game_over_screen, go_to_menu_screen)
+        handle_events(game_state, self.quit_screen, self.settings_screen, self.pause_screen, self.start_screen, self.game_over_screen, self.go_to_menu_screen)
 
         if game_state.paused or not game_state.game_started or game_state.game_over:
             pygame.mouse.set_visible(True)
         else:
             pygame.mouse.set_visible(False)
 
-        update_game(player1, player2, game_state, dt, ball)
+        alpha = self.timestep.advance(frame_time, self.tick)
 
         player1.color = config.PURPLE
         player2.color = config.LIGHT_BLUE
@@ -381,16 +394,22 @@ def main():
             player1,
             player2,
             game_state,
-            pause_screen,
-            start_screen,
-            settings_screen,
-            quit_screen,
-            game_over_screen,
-            go_to_menu_screen,
-            ball
+            self.pause_screen,
+            self.start_screen,
+            self.settings_screen,
+            self.quit_screen,
+            self.game_over_screen,
+            self.go_to_menu_screen,
+            self.ball,
+            alpha
         )
 
         pygame.display.flip()
 
+
+def main():
+    scenes.manager.run(TrailPongScene)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
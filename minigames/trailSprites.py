@@ -0,0 +1,42 @@
+import numpy as np
+import pygame
+
+import config
+
+ALPHA_BUCKETS = 32
+# alpha of each bucket, fading from 50 at the tail to 255 at the head
+ALPHA_LUT = [int(50 + 205 * b / (ALPHA_BUCKETS - 1)) for b in range(ALPHA_BUCKETS)]
+
+
+class TrailSprites:
+    # Pre-rendered dot sprites per (color, alpha bucket), rebuilt only after a palette switch
+    def __init__(self, radius):
+        self.radius = radius
+        self.cache = {}
+        self.palette_version = config.palette_version
+
+    def render(self, color, alpha):
+        size = 2 * self.radius
+        surf = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(surf, (*color, alpha), (self.radius, self.radius), self.radius)
+        return surf.convert_alpha()
+
+    def get(self, color):
+        if self.palette_version != config.palette_version:
+            self.cache.clear()
+            self.palette_version = config.palette_version
+        color = tuple(color[:3])
+        sprites = self.cache.get(color)
+        if sprites is None:
+            sprites = self.cache[color] = [self.render(color, alpha) for alpha in ALPHA_LUT]
+        return sprites
+
+    def draw(self, screen, trail, color):
+        points = trail.view()
+        length = len(points)
+        if not length:
+            return
+        sprites = self.get(color)
+        buckets = (np.arange(length) * ALPHA_BUCKETS // length).tolist()
+        positions = (points - self.radius).astype(int).tolist()
+        screen.blits([(sprites[b], pos) for b, pos in zip(buckets, positions)], doreturn=False)
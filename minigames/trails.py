@@ -1,33 +1,192 @@
 import pygame
-import sys
+import math
+from collections import deque
+import numpy as np
 
 import config
+import scenes
+import textCache
 import screens
+from timestep import FixedTimestep
+from minigames.trailBuffer import TrailBuffer, capacity_for
+from minigames.trailSprites import TrailSprites
 
-PLAYER_SPEED = 5
+PLAYER_SPEED = 300  # pixels per second
 PLAYER_SIZE = 30
-START_TRAIL_LENGTH = 10
-MAX_TRAIL_LENGTH = 2000
-GROWTH_PER_SECOND = 10
+# trail lengths are pixels of path
+START_TRAIL_LENGTH = 50
+MAX_TRAIL_LENGTH = 10000
+GROWTH_PER_SECOND = 50
+GRID_CELL_SIZE = PLAYER_SIZE
+
+PLAYER_RADIUS = PLAYER_SIZE // 3
+TRAIL_RADIUS = PLAYER_SIZE // 10
+HIT_RADIUS = PLAYER_RADIUS + TRAIL_RADIUS
+# Trail just behind a head is never a crash. The sharpest possible turn is 135°,
+# so a head can only reach its own trail again after HIT_RADIUS / sin(22.5°) of path.
+# The first PLAYER_RADIUS of the opponent's trail is still under their head.
+SELF_EXCLUSION = HIT_RADIUS / math.sin(math.pi / 8) + 1
+OPPONENT_EXCLUSION = PLAYER_RADIUS
+
+trail_sprites = TrailSprites(TRAIL_RADIUS)
+
+
+def point_segment_dist_sq(p, a, b):
+    # Squared distance from p to segment a-b, broadcast over leading axes
+    ab = b - a
+    length_sq = np.sum(ab * ab, axis=-1)
+    t = np.clip(np.sum((p - a) * ab, axis=-1) / np.where(length_sq > 0, length_sq, 1), 0, 1)
+    d = p - (a + ab * t[..., None])
+    return np.sum(d * d, axis=-1)
+
+def segment_dist_sq(p0, p1, a, b):
+    # Squared distance between segment p0-p1 and every segment a[i]-b[i]
+    def cross(o, u, v):
+        return (u[..., 0] - o[..., 0]) * (v[..., 1] - o[..., 1]) - (u[..., 1] - o[..., 1]) * (v[..., 0] - o[..., 0])
+    crossing = (cross(p0, p1, a) * cross(p0, p1, b) < 0) & (cross(a, b, p0) * cross(a, b, p1) < 0)
+    dist_sq = np.minimum(
+        np.minimum(point_segment_dist_sq(p0, a, b), point_segment_dist_sq(p1, a, b)),
+        np.minimum(point_segment_dist_sq(a, p0, p1), point_segment_dist_sq(b, p0, p1))
+    )
+    return np.where(crossing, 0, dist_sq)
+
+
+class SpatialGrid:
+    # Uniform grid over trail segments, keyed by the cell of each segment's newer
+    # end. Buckets keep insertion order so the oldest segment is always in front
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def cell(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def insert(self, index, x, y):
+        key = self.cell(x, y)
+        bucket = self.cells.get(key)
+        if bucket is None:
+            bucket = self.cells[key] = deque()
+        bucket.append(index)
+
+    def remove_oldest(self, x, y):
+        key = self.cell(x, y)
+        bucket = self.cells[key]
+        bucket.popleft()
+        if not bucket:
+            del self.cells[key]
+
+    def query(self, left, top, right, bottom):
+        x0, y0 = self.cell(left, top)
+        x1, y1 = self.cell(right, bottom)
+        candidates = []
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket is not None:
+                    candidates.extend(bucket)
+        return candidates
+
+    def clear(self):
+        self.cells.clear()
 
 
 class Player:
+    # The trail is a polyline of capsules: segment k joins trail points k - 1 and k
     def __init__(self, color, pos):
         self.color = color
         self.pos = pos
+        self.prev_pos = pygame.Vector2(pos)
         self.speed = PLAYER_SPEED
-        self.trail = []
+        self.trail = TrailBuffer(capacity_for(MAX_TRAIL_LENGTH, self.speed))
+        self.grid = SpatialGrid(GRID_CELL_SIZE)
+        self.max_step = 0.0  # longest trail segment, how far the grid has to look around a sweep
         self.dir = pygame.Vector2(0, -1)
         self.wins = 0
 
     def reset(self, x, y):
         self.pos.update(x, y)
+        self.prev_pos.update(x, y)
         self.dir = pygame.Vector2(0, -1)
         self.trail.clear()
+        self.grid.clear()
+        self.max_step = 0.0
+
+    def add_trail_point(self, x, y):
+        if len(self.trail) == self.trail.capacity:
+            self.drop_oldest()
+        if len(self.trail):
+            self.grid.insert(self.trail.count, x, y)
+        travelled = self.trail.total
+        self.trail.append(x, y)
+        self.max_step = max(self.max_step, self.trail.total - travelled)
+
+    def drop_oldest(self):
+        # the oldest segment starts at the point being dropped
+        if len(self.trail) > 1:
+            oldest = self.trail.count - len(self.trail)
+            self.grid.remove_oldest(*self.trail.points(oldest + 1))
+        self.trail.popleft()
+
+    def trim_trail(self, max_length):
+        while len(self.trail) > 1 and self.trail.path_length() > max_length:
+            self.drop_oldest()
+
+    def steer(self, up, down, left, right):
+        move_dir = pygame.Vector2(self.dir)
+        # edit y-component
+        if up and move_dir.y != 1:
+            move_dir.y = -1
+        elif down and move_dir.y != -1:
+            move_dir.y = 1
+        else:
+            move_dir.y = 0
+        # edit x-component
+        if left and move_dir.x != 1:
+            move_dir.x = -1
+        elif right and move_dir.x != -1:
+            move_dir.x = 1
+        else:
+            move_dir.x = 0
+        if move_dir.length() > 0:
+            self.dir = move_dir.normalize()
+
+    def sweep(self):
+        # Head movement during the last tick as (start, end)
+        if len(self.trail) < 2:
+            end = self.trail.points(self.trail.count - 1)
+            return end, end
+        points = self.trail.points((self.trail.count - 2, self.trail.count - 1))
+        return points[0], points[1]
+
+    def trail_hits(self, p0, p1, radius, ref_arc, exclusion):
+        # True if the swept circle p0 -> p1 touches a segment that ends at least
+        # exclusion path length before ref_arc
+        reach = radius + self.max_step
+        candidates = self.grid.query(
+            min(p0[0], p1[0]) - reach, min(p0[1], p1[1]) - reach,
+            max(p0[0], p1[0]) + reach, max(p0[1], p1[1]) + reach
+        )
+        if not candidates:
+            return False
+        segments = np.array(candidates)
+        segments = segments[ref_arc - self.trail.arcs(segments) >= exclusion]
+        if not len(segments):
+            return False
+        dist_sq = segment_dist_sq(p0, p1, self.trail.points(segments - 1), self.trail.points(segments))
+        return bool((dist_sq < radius * radius).any())
+
+    def crashed(self, other):
+        p0, p1 = self.sweep()
+        if len(self.trail) > 1 and (p0 == p1).all():
+            # pinned against the border
+            return True
+        own_arc = self.trail.arcs(self.trail.count - 2) if len(self.trail) > 1 else 0.0
+        return (self.trail_hits(p0, p1, HIT_RADIUS, own_arc, SELF_EXCLUSION)
+                or other.trail_hits(p0, p1, HIT_RADIUS, other.trail.total, OPPONENT_EXCLUSION))
 
 class GameState:
     def __init__(self):
-        self.start_ticks = pygame.time.get_ticks()
+        self.elapsed = 0.0  # seconds of play since the round started
         self.countdown_time = 3.0
         self.game_over = False
         self.show_settings = False
@@ -37,30 +196,13 @@ class GameState:
         self.go_to_menu = False
 
 def check_collision(player1, player2):
-    player1_center = player1.pos + pygame.Vector2(PLAYER_SIZE / 2, PLAYER_SIZE / 2)
-    player2_center = player2.pos + pygame.Vector2(PLAYER_SIZE / 2, PLAYER_SIZE / 2)
-    player_radius = PLAYER_SIZE // 3
-    trail_radius = PLAYER_SIZE // 10
-
-    for pos in player1.trail[:-7]:
-        if player1_center.distance_to(pos) < player_radius + trail_radius:
-            player2.wins += 1
-            return True
+    if player1.crashed(player2):
+        player2.wins += 1
+        return True
 
-    for pos in player2.trail[:-4]:
-        if player1_center.distance_to(pos) < player_radius + trail_radius:
-            player2.wins += 1
-            return True
-
-    for pos in player1.trail[:-4]:
-        if player2_center.distance_to(pos) < player_radius + trail_radius:
-            player1.wins += 1
-            return True
-
-    for pos in player2.trail[:-7]:
-        if player2_center.distance_to(pos) < player_radius + trail_radius:
-            player1.wins += 1
-            return True
+    if player2.crashed(player1):
+        player1.wins += 1
+        return True
 
     return False
 
@@ -76,11 +218,9 @@ def handle_events(
     for event in pygame.event.get():
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_q and (event.mod & pygame.KMOD_META):
-                pygame.quit()
-                sys.exit()
+                scenes.manager.quit()
         if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
+            scenes.manager.quit()
 
         if game_state.show_quit_confirmation:
             quit_screen.handle(game_state, event)
@@ -121,65 +261,39 @@ def restart_game(player1, player2, game_state):
     player2.reset(3 * config.WIDTH // 4, config.HEIGHT // 2)
     game_state.game_over = False
     game_state.countdown_time = 3.0
-    game_state.start_ticks = pygame.time.get_ticks()
+    game_state.elapsed = 0.0
+
+def read_actions(keys):
+    # (up, down, left, right) for each player
+    return (
+        (keys[pygame.K_w], keys[pygame.K_s], keys[pygame.K_a], keys[pygame.K_d]),
+        (keys[pygame.K_UP], keys[pygame.K_DOWN], keys[pygame.K_LEFT], keys[pygame.K_RIGHT])
+    )
 
 def update_game(player1, player2, game_state, dt):
+    step(player1, player2, game_state, read_actions(pygame.key.get_pressed()), dt)
+
+def step(player1, player2, game_state, actions, dt):
+    # Advances the match by dt seconds using explicit actions (see read_actions).
+    # No display, event or clock access, so it can run headless and faster than real time
     if not game_state.game_started:
-        return
+        return game_state
     if game_state.paused or game_state.game_over:
-        return
+        return game_state
 
-    keys = pygame.key.get_pressed()
+    game_state.elapsed += dt
 
     if game_state.countdown_time > 0:
         game_state.countdown_time -= dt
         if game_state.countdown_time < 0:
             game_state.countdown_time = 0
-        return
-
-    if game_state.game_over:
-        restart_game(player1, player2, game_state)
-
-    move_dir1 = pygame.Vector2(player1.dir)
-    # edit y-component
-    if keys[pygame.K_w] and move_dir1.y != 1:
-        move_dir1.y = -1
-    elif keys[pygame.K_s] and move_dir1.y != -1:
-        move_dir1.y = 1
-    else:
-        move_dir1.y = 0
-    # edit x-component
-    if keys[pygame.K_a] and move_dir1.x != 1:
-        move_dir1.x = -1
-    elif keys[pygame.K_d] and move_dir1.x != -1:
-        move_dir1.x = 1
-    else:
-        move_dir1.x = 0
-    if move_dir1.length() > 0:
-        move_dir1 = move_dir1.normalize()
-        player1.dir = move_dir1
-
-    move_dir2 = pygame.Vector2(player2.dir)
-    # edit y-component
-    if keys[pygame.K_UP] and move_dir2.y != 1:
-        move_dir2.y = -1
-    elif keys[pygame.K_DOWN] and move_dir2.y != -1:
-        move_dir2.y = 1
-    else:
-        move_dir2.y = 0
-    # edit x-component
-    if keys[pygame.K_LEFT] and move_dir2.x != 1:
-        move_dir2.x = -1
-    elif keys[pygame.K_RIGHT] and move_dir2.x != -1:
-        move_dir2.x = 1
-    else:
-        move_dir2.x = 0
-    if move_dir2.length() > 0:
-        move_dir2 = move_dir2.normalize()
-        player2.dir = move_dir2
-
-    player1.pos += player1.dir * player1.speed
-    player2.pos += player2.dir * player2.speed
+        return game_state
+
+    player1.steer(*actions[0])
+    player2.steer(*actions[1])
+
+    player1.pos += player1.dir * player1.speed * dt
+    player2.pos += player2.dir * player2.speed * dt
 
     # check screen borders
     player1.pos.x = max(0, min(config.WIDTH - PLAYER_SIZE, player1.pos.x))
@@ -188,21 +302,20 @@ def update_game(player1, player2, game_state, dt):
     player2.pos.y = max(0, min(config.HEIGHT - PLAYER_SIZE, player2.pos.y))
 
     # update trails
-    player1.trail.append(player1.pos + pygame.Vector2(PLAYER_SIZE / 2, PLAYER_SIZE / 2))
-    player2.trail.append(player2.pos + pygame.Vector2(PLAYER_SIZE / 2, PLAYER_SIZE / 2))
+    player1.add_trail_point(player1.pos.x + PLAYER_SIZE / 2, player1.pos.y + PLAYER_SIZE / 2)
+    player2.add_trail_point(player2.pos.x + PLAYER_SIZE / 2, player2.pos.y + PLAYER_SIZE / 2)
 
-    seconds_passed = (pygame.time.get_ticks() - game_state.start_ticks) / 1000
-    trail_max_length = min(MAX_TRAIL_LENGTH, int(START_TRAIL_LENGTH + GROWTH_PER_SECOND * seconds_passed))
+    trail_max_length = min(MAX_TRAIL_LENGTH, START_TRAIL_LENGTH + GROWTH_PER_SECOND * game_state.elapsed)
 
-    if len(player1.trail) > trail_max_length:
-        player1.trail.pop(0)
-    if len(player2.trail) > trail_max_length:
-        player2.trail.pop(0)
+    player1.trim_trail(trail_max_length)
+    player2.trim_trail(trail_max_length)
 
     # check for collision
     if check_collision(player1, player2):
         game_state.game_over = True
 
+    return game_state
+
 def draw_game(
         screen,
         player1,
@@ -213,20 +326,20 @@ def draw_game(
         settings_screen,
         quit_screen,
         game_over_screen,
-        go_to_menu_screen
+        go_to_menu_screen,
+        alpha=1.0
 ):
     screen.fill(config.BLACK)
 
     draw_score(screen, player1, player2)
-    draw_players(screen, player1, player2)
+    draw_players(screen, player1, player2, alpha)
     pygame.draw.rect(screen, config.WHITE, config.get_border(), width=config.border_width)
     pygame.draw.rect(screen, config.get_rect_below_border_color(), config.get_rect_below_border())
 
     if game_state.game_started:
         # countdown
         if game_state.countdown_time > 0:
-            countdown_font = pygame.font.SysFont(None, 150)
-            countdown_text = countdown_font.render(str(int(game_state.countdown_time) + 1), True, config.WHITE)
+            countdown_text = textCache.render(config.fonts['countdown'], str(int(game_state.countdown_time) + 1), config.WHITE)
             countdown_rect = countdown_text.get_rect(center=(config.WIDTH // 2, config.HEIGHT // 2))
             screen.blit(countdown_text, countdown_rect)
 
@@ -252,71 +365,72 @@ def draw_game(
                 game_over_screen.draw_screen(config.screen)
 
 
-def draw_players(screen, player1, player2):
+def draw_players(screen, player1, player2, alpha=1.0):
     # draw trails
-    trail_length = len(player1.trail)
-    for i, pos in enumerate(player1.trail):
-        alpha = int(50 + 205 * (i / trail_length))
-        color = (*player1.color[:3], alpha)
-        trail_surf = pygame.Surface((PLAYER_SIZE, PLAYER_SIZE), pygame.SRCALPHA)
-        pygame.draw.circle(trail_surf, color, (PLAYER_SIZE // 2, PLAYER_SIZE // 2), PLAYER_SIZE // 10)
-        screen.blit(trail_surf, (int(pos.x - PLAYER_SIZE // 2), int(pos.y - PLAYER_SIZE // 2)))
-
-    trail_length = len(player2.trail)
-    for i, pos in enumerate(player2.trail):
-        alpha = int(50 + 205 * (i / trail_length))
-        color = (*player2.color[:3], alpha)
-        trail_surf = pygame.Surface((PLAYER_SIZE, PLAYER_SIZE), pygame.SRCALPHA)
-        pygame.draw.circle(trail_surf, color, (PLAYER_SIZE // 2, PLAYER_SIZE // 2), PLAYER_SIZE // 10)
-        screen.blit(trail_surf, (int(pos.x - PLAYER_SIZE // 2), int(pos.y - PLAYER_SIZE // 2)))
-
-    # draw player
-    pygame.draw.circle(screen, player1.color, (int(player1.pos.x + PLAYER_SIZE / 2), int(player1.pos.y + PLAYER_SIZE / 2)), PLAYER_SIZE // 3)
-    pygame.draw.circle(screen, player2.color, (int(player2.pos.x + PLAYER_SIZE / 2), int(player2.pos.y + PLAYER_SIZE / 2)), PLAYER_SIZE // 3)
+    trail_sprites.draw(screen, player1.trail, player1.color)
+    trail_sprites.draw(screen, player2.trail, player2.color)
+
+    # draw player, interpolated between the last two ticks
+    for player in (player1, player2):
+        pos = player.prev_pos.lerp(player.pos, alpha)
+        pygame.draw.circle(screen, player.color, (int(pos.x + PLAYER_SIZE / 2), int(pos.y + PLAYER_SIZE / 2)), PLAYER_SIZE // 3)
 
 def draw_score(screen, player1, player2):
-    text = config.fonts['score'].render(str(player1.wins), True, config.WHITE)
+    text = textCache.render(config.fonts['score'], str(player1.wins), config.WHITE)
     rect = text.get_rect(center=(config.WIDTH // 4, 50))
     screen.blit(text, rect)
 
-    text = config.fonts['score'].render(str(player2.wins), True, config.WHITE)
+    text = textCache.render(config.fonts['score'], str(player2.wins), config.WHITE)
     rect = text.get_rect(center=((config.WIDTH // 4) * 3, 50))
     screen.blit(text, rect)
 
 
-def main():
-
-    pygame.init()
+class TrailsScene(scenes.Scene):
+    caption = "Trails"
 
-    pygame.display.set_caption("Trails")
-    config.WIDTH, config.HEIGHT = config.screen.get_size()
+    def __init__(self):
+        self.quit_screen = screens.QuitScreen()
+        self.settings_screen = screens.SettingsScreen()
+        self.pause_screen = screens.PauseScreen()
+        self.start_screen = screens.StartScreen()
+        self.game_over_screen = screens.GameOverScreen(lambda: restart_game(self.player1, self.player2, self.game_state))
+        self.go_to_menu_screen = screens.GoToMenuScreen()
+        self.menus = (
+            self.quit_screen, self.settings_screen, self.pause_screen,
+            self.start_screen, self.game_over_screen, self.go_to_menu_screen,
+        )
 
-    quit_screen = screens.QuitScreen()
-    settings_screen = screens.SettingsScreen()
-    pause_screen = screens.PauseScreen()
-    start_screen = screens.StartScreen()
-    game_over_screen = screens.GameOverScreen(lambda: restart_game(player1, player2, game_state))
-    go_to_menu_screen = screens.GoToMenuScreen()
+    def enter(self):
+        # A fresh match every time the game is opened
+        super().enter()
+        self.player1 = Player(config.PURPLE, pygame.Vector2(config.WIDTH // 4 - 15, config.HEIGHT // 2 - 15))
+        self.player2 = Player(config.LIGHT_BLUE, pygame.Vector2(3 * config.WIDTH // 4 - 15, config.HEIGHT // 2 - 15))
 
-    player1 = Player(config.PURPLE, pygame.Vector2(config.WIDTH // 4 - 15, config.HEIGHT // 2 - 15))
-    player2 = Player(config.LIGHT_BLUE, pygame.Vector2(3 * config.WIDTH // 4 - 15, config.HEIGHT // 2 - 15))
+        self.game_state = GameState()
 
-    game_state = GameState()
+        self.timestep = FixedTimestep()
 
+    def tick(self, dt):
+        self.player1.prev_pos.update(self.player1.pos)
+        self.player2.prev_pos.update(self.player2.pos)
+        update_game(self.player1, self.player2, self.game_state, dt)
 
-    clock = pygame.time.Clock()
+    def animating(self):
+        # The match and its countdown run until it is paused or over
+        game_state = self.game_state
+        return game_state.game_started and not (game_state.paused or game_state.game_over)
 
-    while True:
-        dt = clock.tick(60) / 1000
+    def frame(self, frame_time):
+        player1, player2, game_state = self.player1, self.player2, self.game_state
 
-        handle_events(game_state, quit_screen, settings_screen, pause_screen, start_screen, game_over_screen, go_to_menu_screen)
+        handle_events(game_state, self.quit_screen, self.settings_screen, self.pause_screen, self.start_screen, self.game_over_screen, self.go_to_menu_screen)
 
         if game_state.paused or not game_state.game_started or game_state.game_over:
             pygame.mouse.set_visible(True)
         else:
             pygame.mouse.set_visible(False)
 
-        update_game(player1, player2, game_state, dt)
+        alpha = self.timestep.advance(frame_time, self.tick)
 
         player1.color = config.PURPLE
         player2.color = config.LIGHT_BLUE
@@ -326,15 +440,21 @@ def main():
             player1,
             player2,
             game_state,
-            pause_screen,
-            start_screen,
-            settings_screen,
-            quit_screen,
-            game_over_screen,
-            go_to_menu_screen
+            self.pause_screen,
+            self.start_screen,
+            self.settings_screen,
+            self.quit_screen,
+            self.game_over_screen,
+            self.go_to_menu_screen,
+            alpha
         )
 
         pygame.display.flip()
 
+
+def main():
+    scenes.manager.run(TrailsScene)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,136 @@
+import pygame
+import sys
+
+import config
+
+
+class Scene:
+    # The menu or a game, run by the SceneManager. Every scene class has one
+    # instance that is created on first use and reused afterwards; enter()
+    # runs each time the scene comes to the top of the stack and starts it fresh
+    caption = 'Arcade'
+    menus = ()  # the scene's ScreenBase instances
+
+    def enter(self):
+        pygame.display.set_caption(self.caption)
+        config.WIDTH, config.HEIGHT = config.screen.get_size()
+        for menu in self.menus:
+            menu.reset()
+
+    def animating(self):
+        # Whether anything moves without input; if not the manager sleeps
+        # until the next event instead of drawing at the full frame rate
+        return True
+
+    def exit(self):
+        # The scene is no longer on top, stop whatever runs in the background
+        pass
+
+    def quit(self):
+        # The program ends, release the threads and pools the scene keeps
+        # across visits
+        pass
+
+    def frame(self, frame_time):
+        # Handle events, update and draw one frame; frame_time is in seconds
+        raise NotImplementedError
+
+
+class SceneManager:
+    # Owns the display and the fonts and runs the one main loop for a stack
+    # of scenes; only the top scene gets frames. push, pop and replace take
+    # effect after the current frame, so a scene always finishes its frame.
+    # While the top scene is animating frames run at config.FPS, otherwise
+    # the loop blocks on the event queue and draws once per event or every
+    # config.IDLE_TIMEOUT ms, so menus and turn-based play barely use the CPU
+    def __init__(self):
+        self.stack = []
+        self.scenes = {}  # scene class -> its instance
+        self.pending = []
+        self.clock = None
+
+    def setup(self):
+        pygame.init()
+        config.fonts['standard_button'] = pygame.font.SysFont(None, 50)
+        config.fonts['selected_button'] = pygame.font.SysFont(None, 65)
+        config.fonts['score'] = pygame.font.SysFont(None, 40)
+        config.fonts['countdown'] = pygame.font.SysFont(None, 150)
+
+        config.screen = pygame.display.set_mode((config.WIDTH, config.HEIGHT), pygame.RESIZABLE)
+        config.WIDTH, config.HEIGHT = pygame.display.get_surface().get_size()
+        self.clock = pygame.time.Clock()
+
+    def scene(self, scene_class):
+        scene = self.scenes.get(scene_class)
+        if scene is None:
+            scene = self.scenes[scene_class] = scene_class()
+        return scene
+
+    def push(self, scene_class):
+        self.pending.append(('push', scene_class))
+
+    def pop(self):
+        self.pending.append(('pop', None))
+
+    def replace(self, scene_class):
+        self.pending.append(('replace', scene_class))
+
+    def apply(self):
+        if not self.pending:
+            return
+        top = self.stack[-1] if self.stack else None
+        for op, scene_class in self.pending:
+            if op in ('pop', 'replace') and self.stack:
+                self.stack.pop()
+            if op in ('push', 'replace'):
+                self.stack.append(self.scene(scene_class))
+        self.pending = []
+        if self.stack and self.stack[-1] is top:
+            return
+        if top is not None:
+            top.exit()
+        if self.stack:
+            self.stack[-1].enter()
+
+    def quit(self):
+        # Ends the program, used instead of pygame.quit(); sys.exit() so that
+        # no worker thread or process pool outlives the window
+        if self.stack:
+            self.stack[-1].exit()
+        for scene in self.scenes.values():
+            scene.quit()
+        pygame.quit()
+        sys.exit()
+
+    def run(self, scene_class):
+        # Main loop, returns once the last scene is popped
+        self.setup()
+        self.push(scene_class)
+        self.apply()
+        while self.stack:
+            scene = self.stack[-1]
+            if scene.animating():
+                frame_time = self.clock.tick(config.FPS) / 1000
+            else:
+                self.wait_for_event()
+                # The time spent waiting is not simulated
+                self.clock.tick()
+                frame_time = 0.0
+            scene.frame(frame_time)
+            self.apply()
+
+    def wait_for_event(self):
+        # Block until an event is queued or the timeout passes, leaving the
+        # queue for the scene in its original order. pygame.event.peek is not
+        # used, it can strip the attributes of posted events such as AI_MOVE
+        events = pygame.event.get()
+        if not events:
+            event = pygame.event.wait(config.IDLE_TIMEOUT)
+            if event.type == pygame.NOEVENT:
+                return
+            events = [event] + pygame.event.get()
+        for event in events:
+            pygame.event.post(event)
+
+
+manager = SceneManager()
@@ -1,8 +1,9 @@
 import pygame
-import sys
 
 import config
 import menu
+import scenes
+import textCache
 
 class ScreenBase:
     def __init__(self, button_names):
@@ -20,6 +21,11 @@ class ScreenBase:
             )
             self.buttons[name] = rect
 
+    def reset(self):
+        # Back to the first button, as on a newly created screen
+        self.cur_key = 0
+        self.selected = self.buttons_name[0]
+
     def scroll(self, event):
         if event.key == pygame.K_DOWN:
             self.cur_key = (self.cur_key + 1) % len(self.buttons_name)
@@ -60,6 +66,8 @@ class ScreenBase:
         pass
 
     def draw_buttons(self, screen, label_overrides=None):
+        # Labels come from the text cache, so a frame costs one small blit per
+        # button; the border and the rect below it are drawn once, after them
         label_overrides = label_overrides or {}
         for name in self.buttons_name:
             rect = self.buttons[name]
@@ -76,16 +84,27 @@ class ScreenBase:
                 font = config.fonts['standard_button']
 
             label = label_overrides.get(name, name)
-            text_surf = font.render(label.title(), True, text_color)
+            text_surf = textCache.render(font, label.title(), text_color)
             text_rect = text_surf.get_rect(center=rect.center)
             screen.blit(text_surf, text_rect)
 
-            pygame.draw.rect(screen, config.WHITE, config.get_border(), width=config.border_width)
-            pygame.draw.rect(screen, config.get_rect_below_border_color(), config.get_rect_below_border())
+        pygame.draw.rect(screen, config.WHITE, config.get_border(), width=config.border_width)
+        pygame.draw.rect(screen, config.get_rect_below_border_color(), config.get_rect_below_border())
 
 class ChooseStartingPlayerScreen(ScreenBase):
-    def __init__(self):
-        super().__init__(['player 1 starts', 'player 2 starts', 'settings', 'menu', 'quit'])
+    def __init__(self, opponents=('human',), board_sizes=()):
+        # opponents: names the 'opponent' button cycles through, 'human' for hot-seat
+        # board_sizes: (rows, cols, connect) the 'board' button cycles through
+        self.opponents = list(opponents)
+        self.opponent = 0
+        self.board_sizes = list(board_sizes)
+        self.board_size = 0
+        names = ['player 1 starts', 'player 2 starts']
+        if len(self.opponents) > 1:
+            names.append('opponent')
+        if len(self.board_sizes) > 1:
+            names.append('board')
+        super().__init__(names + ['settings', 'menu', 'quit'])
 
     def handle_selection(self, selection, game_state, mouse=False):
         match selection:
@@ -99,6 +118,12 @@ class ChooseStartingPlayerScreen(ScreenBase):
                 game_state.players[1].is_turn = True
                 game_state.choose_starting_player = False
                 game_state.game_started = True
+            case 'opponent':
+                self.opponent = (self.opponent + 1) % len(self.opponents)
+                game_state.opponent = self.opponents[self.opponent]
+            case 'board':
+                self.board_size = (self.board_size + 1) % len(self.board_sizes)
+                game_state.choose_board(*self.board_sizes[self.board_size])
             case 'settings':
                 game_state.show_settings = True
             case 'menu':
@@ -109,7 +134,12 @@ class ChooseStartingPlayerScreen(ScreenBase):
 
 
     def draw_screen(self, screen):
-        self.draw_buttons(screen)
+        opponent = self.opponents[self.opponent]
+        labels = {'opponent': opponent if opponent == 'puzzles' else f'vs {opponent}'}
+        if self.board_sizes:
+            rows, cols, connect = self.board_sizes[self.board_size]
+            labels['board'] = f'{rows}x{cols} connect {connect}'
+        self.draw_buttons(screen, label_overrides=labels)
 
 
 
@@ -138,7 +168,12 @@ class GoToMenuScreen(ScreenBase):
     def handle_selection(self, selection, game_state, mouse=False):
         match selection:
             case 'menu':
-                menu.main()
+                # A game opened from the menu goes back to it, one started on
+                # its own is replaced by the menu
+                if len(scenes.manager.stack) > 1:
+                    scenes.manager.pop()
+                else:
+                    scenes.manager.replace(menu.MenuScene)
             case 'back':
                 game_state.go_to_menu = False
         # Reset to default if closed
@@ -185,8 +220,7 @@ class QuitScreen(ScreenBase):
     def handle_selection(self, selection, game_state, mouse=False):
         match selection:
             case 'exit':
-                pygame.quit()
-                sys.exit()
+                scenes.manager.quit()
             case 'back':
                 game_state.show_quit_confirmation = False
         if not game_state.show_quit_confirmation:
@@ -218,6 +252,7 @@ class SettingsScreen(ScreenBase):
         config.RED = x
 
         config.darkmode = not config.darkmode
+        config.palette_version += 1
 
     def handle_selection(self, selection, game_state, mouse=False):
         match selection:
@@ -243,7 +278,6 @@ class PauseScreen(ScreenBase):
             case 'resume':
                 game_state.paused = False
                 game_state.countdown_time = 3.0
-                game_state.start_ticks = pygame.time.get_ticks()
             case 'settings':
                 game_state.show_settings = True
             case 'menu':
@@ -267,7 +301,6 @@ class StartScreen(ScreenBase):
             case 'start':
                 game_state.game_started = True
                 game_state.countdown_time = 3.0
-                game_state.start_ticks = pygame.time.get_ticks()
             case 'settings':
                 game_state.show_settings = True
             case 'menu':
@@ -0,0 +1,51 @@
+from collections import OrderedDict
+
+import config
+
+# Memory the cached text surfaces may use before the least recently used go
+MAX_BYTES = 4 * 1024 * 1024
+
+
+class TextCache:
+    # Rendered text surfaces keyed by (font, text, color, antialias). Scores,
+    # button labels and the countdown change rarely, so most frames only blit
+    # surfaces that were rendered and converted once. The whole cache is
+    # dropped after a palette switch
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.surfaces = OrderedDict()
+        self.bytes = 0
+        self.palette_version = config.palette_version
+
+    def clear(self):
+        self.surfaces.clear()
+        self.bytes = 0
+
+    def render(self, font, text, color, antialias=True):
+        if self.palette_version != config.palette_version:
+            self.clear()
+            self.palette_version = config.palette_version
+        key = (font, text, tuple(color), antialias)
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.surfaces.move_to_end(key)
+            return surf
+        surf = font.render(text, antialias, color).convert_alpha()
+        self.surfaces[key] = surf
+        self.bytes += size_of(surf)
+        while self.bytes > self.max_bytes and len(self.surfaces) > 1:
+            _, old = self.surfaces.popitem(last=False)
+            self.bytes -= size_of(old)
+        return surf
+
+
+def size_of(surf):
+    return surf.get_pitch() * surf.get_height()
+
+
+cache = TextCache()
+
+
+def render(font, text, color, antialias=True):
+    # Same as font.render(text, antialias, color), but from the shared cache
+    return cache.render(font, text, color, antialias)
@@ -0,0 +1,23 @@
+import config
+
+# Longest frame the simulation catches up on; anything above is dropped so a
+# stall does not trigger a burst of ticks
+MAX_FRAME_TIME = 0.25
+
+
+class FixedTimestep:
+    # Runs the simulation at a fixed tick rate, independent of the frame rate.
+    # Frame time is collected in an accumulator and spent in whole ticks; what is
+    # left over becomes the interpolation factor between the last two states
+    def __init__(self, tick_rate=None):
+        self.tick_rate = tick_rate or config.TICK_RATE
+        self.dt = 1 / self.tick_rate
+        self.accumulator = 0.0
+
+    def advance(self, frame_time, tick):
+        # Calls tick(dt) as often as frame_time allows and returns the render alpha
+        self.accumulator += min(frame_time, MAX_FRAME_TIME)
+        while self.accumulator >= self.dt:
+            tick(self.dt)
+            self.accumulator -= self.dt
+        return self.accumulator / self.dt